@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from .worker import broker
@@ -5,8 +7,16 @@ import taskiq_fastapi
 
 from app.routers import psychologists, patients, pti, pti_stimulus_area, pti_specific_objectives_topics, \
     pti_specific_objectives_subtopics, patient_record, idadi, idadi_domains, programs_upload
+from app.service.minio import STORAGE_BACKEND
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    await STORAGE_BACKEND.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 taskiq_fastapi.init(broker, 'app.main:app')
 
 origins = [
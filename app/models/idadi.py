@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models import Base, TimestampMixin
@@ -9,6 +9,9 @@ from app.models import Base, TimestampMixin
 
 class Idadi(Base, TimestampMixin):
     __tablename__ = 'idadi'
+    __table_args__ = (
+        Index('ix_idadi_id_patient', 'id_patient'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     protocol_age: Mapped[int]
     application_date: Mapped[datetime]
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from app.models import Base, TimestampMixin
@@ -6,6 +6,10 @@ from app.models import Base, TimestampMixin
 
 class IdadiNormativeTables(Base, TimestampMixin):
     __tablename__ = 'idadi_normative_tables'
+    __table_args__ = (
+        Index('ix_idadi_normative_tables_lookup', 'id_domain', 'raw_score', 'initial_age_range', 'final_age_range',
+              postgresql_include=['standardized']),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     initial_age_range: Mapped[int]
     final_age_range: Mapped[int]
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from app.models import Base, TimestampMixin
@@ -6,6 +6,9 @@ from app.models import Base, TimestampMixin
 
 class IdadiValues(Base, TimestampMixin):
     __tablename__ = 'idadi_values'
+    __table_args__ = (
+        Index('ix_idadi_values_id_idadi', 'id_idadi'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     raw_score: Mapped[int]
     standard_score: Mapped[int]
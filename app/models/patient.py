@@ -1,7 +1,7 @@
 from datetime import date
 from typing import Optional
 
-from sqlalchemy import Text, Date, Integer, ForeignKey
+from sqlalchemy import Text, Date, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from app.models import Base, TimestampMixin
@@ -9,6 +9,9 @@ from app.models import Base, TimestampMixin
 
 class Patient(Base, TimestampMixin):
     __tablename__ = 'patients'
+    __table_args__ = (
+        Index('ix_patients_psychologist_name', 'id_psychologist', 'name'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     name: Mapped[str] = mapped_column(Text, nullable=False)
     birth_date: Mapped[date] = mapped_column(Date, nullable=False)
@@ -1,7 +1,7 @@
 from datetime import date
 from typing import Optional
 
-from sqlalchemy import Text, Date, Integer, ForeignKey
+from sqlalchemy import Text, Date, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from app.models import Base, TimestampMixin
@@ -9,6 +9,9 @@ from app.models import Base, TimestampMixin
 
 class PatientRecord(Base, TimestampMixin):
     __tablename__ = 'patient_records'
+    __table_args__ = (
+        Index('ix_patient_records_id_patient', 'id_patient'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     demand_description: Mapped[Optional[str]]
     instruments_used: Mapped[Optional[str]]
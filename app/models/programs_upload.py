@@ -1,15 +1,31 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models import Base, TimestampMixin
 
+PROGRAM_KIND_PDF = 'pdf'
+PROGRAM_KIND_COVER = 'cover'
+# followed by the thumbnail size, e.g. 'thumb-160'
+PROGRAM_KIND_THUMBNAIL_PREFIX = 'thumb-'
+
+PROGRAM_STATUS_PENDING = 'pending'
+PROGRAM_STATUS_READY = 'ready'
+PROGRAM_STATUS_FAILED = 'failed'
+
 
 class ProgramsUpload(Base, TimestampMixin):
     __tablename__ = 'programs_upload'
+    __table_args__ = (
+        Index('ix_programs_upload_psychologist_generated_sequence', 'id_psychologist', 'generated', 'sequence'),
+        Index('ix_programs_upload_asset_uuid_kind', 'asset_uuid', 'kind', unique=True),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     name: Mapped[str]
     filename: Mapped[str]
     path: Mapped[str]
+    asset_uuid: Mapped[str]
+    kind: Mapped[str]
     generated: Mapped[bool]
     sequence: Mapped[int]
     id_psychologist: Mapped[int] = mapped_column(ForeignKey("psychologists.id"), nullable=False)
+    status: Mapped[str] = mapped_column(default=PROGRAM_STATUS_READY, server_default=PROGRAM_STATUS_READY)
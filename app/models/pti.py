@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import Integer, ForeignKey, func
+from sqlalchemy import Integer, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from app.models import Base, TimestampMixin
@@ -9,6 +9,9 @@ from app.models import Base, TimestampMixin
 
 class Pti(Base, TimestampMixin):
     __tablename__ = 'pti'
+    __table_args__ = (
+        Index('ix_pti_id_patient', 'id_patient'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
 
     id_patient: Mapped[int] = mapped_column(ForeignKey('patients.id'), nullable=False)
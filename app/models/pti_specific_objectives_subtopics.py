@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base, TimestampMixin
@@ -6,6 +6,9 @@ from . import Base, TimestampMixin
 
 class PtiSpecificObjectivesSubTopics(Base, TimestampMixin):
     __tablename__ = 'pti_specific_objectives_subtopics'
+    __table_args__ = (
+        Index('ix_pti_specific_objectives_subtopics_id_topic', 'id_pti_specific_objectives_topics'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     name: Mapped[str] = mapped_column(nullable=False)
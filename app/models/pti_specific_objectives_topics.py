@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base, TimestampMixin
@@ -6,6 +6,9 @@ from . import Base, TimestampMixin
 
 class PtiSpecificObjectivesTopics(Base, TimestampMixin):
     __tablename__ = 'pti_specific_objectives_topics'
+    __table_args__ = (
+        Index('ix_pti_specific_objectives_topics_id_area', 'id_pti_stimulus_area'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False)
     name: Mapped[str] = mapped_column(nullable=False)
 
@@ -1,6 +1,6 @@
 from typing import List
 
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from . import Base, TimestampMixin
@@ -8,6 +8,9 @@ from . import Base, TimestampMixin
 
 class PtiStimulusAreas(Base, TimestampMixin):
     __tablename__ = 'pti_stimulus_areas'
+    __table_args__ = (
+        Index('ix_pti_stimulus_areas_id_pti', 'id_pti'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, init=False, autoincrement=True)
     name: Mapped[str] = mapped_column(nullable=False)
 
@@ -1,8 +1,34 @@
+from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse
 
 from app.database import get_session_generator
+from app.worker import broker
 
 Session = Annotated[AsyncSession, Depends(get_session_generator)]
+
+
+async def get_task_status_response(task_id: str) -> JSONResponse:
+    progress = await broker.result_backend.get_progress(task_id=task_id)
+    # Progress and result expire together after result_ex_time, so an expired task reads as not existing
+    if not progress:
+        return JSONResponse(status_code=HTTPStatus.NOT_FOUND, content={
+            'status': 'not exists'
+        })
+
+    if await broker.result_backend.is_result_ready(task_id):
+        result = await broker.result_backend.get_result(task_id)
+        return JSONResponse(status_code=HTTPStatus.OK, content={
+            'task_id': task_id,
+            'status': 'done',
+            'result': result.return_value
+        })
+    else:
+        return JSONResponse(status_code=HTTPStatus.ACCEPTED, content={
+            'task_id': task_id,
+            'status': 'processing',
+            'progress': progress.meta
+        })
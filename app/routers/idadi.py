@@ -1,24 +1,30 @@
 import datetime
 from datetime import datetime
 from http import HTTPStatus
+from typing import List
+from uuid import uuid4
 
 from fastapi import APIRouter, HTTPException
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert
 from sqlalchemy.orm import joinedload
-from starlette.responses import JSONResponse
 from taskiq import SendTaskError
-from taskiq.depends.progress_tracker import TaskProgress, TaskState
 
-from app.models import Patient, IdadiNormativeTables
+from app.models import Patient
 from app.models.idadi import Idadi
+from app.models.idadi_domains import IdadiDomains
 from app.models.idadi_values import IdadiValues
-from app.routers import Session
-from app.schema.idadi import IdadiUpdateSchema, IdadiInsertSchema, IdadiSchema
+from app.routers import Session, get_task_status_response
+from app.schema.idadi import IdadiUpdateSchema, IdadiInsertSchema, IdadiSchema, IdadiBatchResultSchema, \
+    IdadiProfileInsertSchema, IdadiProfileSchema
+from app.service.idadi_normative import get_normative_index
+from app.service.report_cache import report_cache_key, find_cached_report, claim_report_render, \
+    release_report_render
+from app.service.report_executor import collect_report_stats
 from app.tasks.report import generate_jasper_report
-from app.worker import broker
 
 router = APIRouter(prefix="/idadi", tags=["idadi"], redirect_slashes=True)
 MAIN_REPORT_NAME = 'final_report'
+IDADI_BATCH_MAX_SIZE = 1000
 
 
 @router.get('/report/generate/{id_patient}', status_code=HTTPStatus.CREATED)
@@ -33,41 +39,43 @@ async def generate_report(id_patient: int, session: Session):
             detail='Patient not exists.'
         )
 
+    cache_key = await report_cache_key(session, MAIN_REPORT_NAME, id_patient)
+    pdf_minio_url = await find_cached_report(cache_key)
+    if pdf_minio_url:
+        return {
+            'task_id': None,
+            'status': 'done',
+            'result': pdf_minio_url
+        }
+
+    task_id = uuid4().hex
+    in_flight_task_id = await claim_report_render(cache_key, task_id)
+    if in_flight_task_id:
+        return {
+            'task_id': in_flight_task_id,
+            'status': 'processing'
+        }
+
     try:
-        task_result = await generate_jasper_report.kiq(MAIN_REPORT_NAME, {'id_patient': id_patient})
+        await generate_jasper_report.kicker().with_task_id(task_id).kiq(MAIN_REPORT_NAME, {'id_patient': id_patient},
+                                                                          cache_key=cache_key)
     except SendTaskError as e:
+        await release_report_render(cache_key, task_id)
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=e.as_str())
     return {
-        'task_id': task_result.task_id,
+        'task_id': task_id,
         'status': 'processing'
     }
 
 
 @router.get('/report/status/{task_id}')
 async def status_report(task_id: str):
-    progress = await broker.result_backend.get_progress(task_id=task_id)
-    if not progress:
-        return JSONResponse(status_code=HTTPStatus.NOT_FOUND, content={
-            'status': 'not exists'
-        })
-
-    if await broker.result_backend.is_result_ready(task_id):
-        result = await broker.result_backend.get_result(task_id)
-        return JSONResponse(status_code=HTTPStatus.OK, content={
-            'task_id': task_id,
-            'status': 'done',
-            'result': result.return_value
-        })
-    elif progress.state == TaskState.SUCCESS:
-        return JSONResponse(status_code=HTTPStatus.GONE, content={
-            'task_id': task_id,
-            'status': 'consumed'
-        })
-    else:
-        return JSONResponse(status_code=HTTPStatus.ACCEPTED, content={
-            'task_id': task_id,
-            'status': 'processing'
-        })
+    return await get_task_status_response(task_id)
+
+
+@router.get('/report/stats')
+async def report_executor_stats():
+    return await collect_report_stats()
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=IdadiSchema)
@@ -103,17 +111,9 @@ async def create_idadi_value(idadi: IdadiInsertSchema, session: Session):
     session.add(db_idadi)
     await session.flush()
 
+    normative_index = await get_normative_index(session)
+    normative_index.resolve_standard_scores(age_in_months, idadi.values)
     for value in idadi.values:
-        if not value.standard_score:
-            idadi_normative_value: IdadiNormativeTables = await session.scalar(
-                select(IdadiNormativeTables).where(and_(IdadiNormativeTables.initial_age_range <= age_in_months,
-                                                        IdadiNormativeTables.final_age_range >= age_in_months,
-                                                        IdadiNormativeTables.id_domain == value.id_domain,
-                                                        IdadiNormativeTables.raw_score == value.raw_score)
-                                                   )
-            )
-            value.standard_score = idadi_normative_value.standardized if idadi_normative_value else 0
-
         db_idadi_value = IdadiValues(
             raw_score=value.raw_score,
             standard_score=value.standard_score,
@@ -128,6 +128,89 @@ async def create_idadi_value(idadi: IdadiInsertSchema, session: Session):
     return db_idadi
 
 
+@router.post('/batch', status_code=HTTPStatus.CREATED, response_model=List[IdadiBatchResultSchema])
+async def create_idadi_values_batch(idadis: List[IdadiInsertSchema], session: Session):
+    if len(idadis) > IDADI_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f'At most {IDADI_BATCH_MAX_SIZE} protocols per batch.'
+        )
+
+    ids_patient = {idadi.id_patient for idadi in idadis}
+    patients_birth_date = dict((await session.execute(
+        select(Patient.id, Patient.birth_date).where(Patient.id.in_(ids_patient))
+    )).all())
+    ids_patient_with_idadi = set((await session.scalars(
+        select(Idadi.id_patient).where(Idadi.id_patient.in_(ids_patient))
+    )).all())
+    ids_domain = set((await session.scalars(
+        select(IdadiDomains.id).where(IdadiDomains.id.in_({value.id_domain for idadi in idadis
+                                                           for value in idadi.values}))
+    )).all())
+    normative_index = await get_normative_index(session)
+
+    diff_dates = lambda d1, d2: (d1.year - d2.year) * 12 + d1.month - d2.month
+    results = []
+    accepted = []
+    for index, idadi in enumerate(idadis):
+        result = IdadiBatchResultSchema(index=index, id_patient=idadi.id_patient)
+        results.append(result)
+        if idadi.id_patient not in patients_birth_date:
+            result.error = 'Patient not exists.'
+            continue
+        if idadi.id_patient in ids_patient_with_idadi:
+            result.error = 'Resource already exists.'
+            continue
+        if any(value.id_domain not in ids_domain for value in idadi.values):
+            result.error = 'Domain not exists.'
+            continue
+        ids_patient_with_idadi.add(idadi.id_patient)
+
+        age_in_months = idadi.protocol_age if idadi.protocol_age else diff_dates(
+            datetime.today(), patients_birth_date[idadi.id_patient])
+        normative_index.resolve_standard_scores(age_in_months, idadi.values)
+        accepted.append((result, idadi, age_in_months))
+
+    if not accepted:
+        return results
+
+    ids_idadi = (await session.scalars(
+        insert(Idadi).returning(Idadi.id, sort_by_parameter_order=True),
+        [{
+            'protocol_age': age_in_months,
+            'application_date': idadi.application_date if idadi.application_date else datetime.today(),
+            'id_patient': idadi.id_patient,
+        } for _, idadi, age_in_months in accepted]
+    )).all()
+
+    db_idadi_values = []
+    for (result, idadi, _), id_idadi in zip(accepted, ids_idadi):
+        result.id = id_idadi
+        db_idadi_values.extend({
+            'raw_score': value.raw_score,
+            'standard_score': value.standard_score,
+            'id_domain': value.id_domain,
+            'id_idadi': id_idadi,
+        } for value in idadi.values)
+    if db_idadi_values:
+        await session.execute(insert(IdadiValues), db_idadi_values)
+    await session.commit()
+
+    return results
+
+
+@router.post('/profile', response_model=IdadiProfileSchema)
+async def calculate_idadi_profile(idadi: IdadiProfileInsertSchema, session: Session):
+    normative_index = await get_normative_index(session)
+    values = normative_index.profile(idadi.protocol_age,
+                                     [value.id_domain for value in idadi.values],
+                                     [value.raw_score for value in idadi.values])
+    return {
+        'protocol_age': idadi.protocol_age,
+        'values': values
+    }
+
+
 @router.get("/{id_patient}", response_model=IdadiSchema)
 async def find_idadi_for_patient(id_patient: int, session: Session):
     db_idadi = await session.scalar(
@@ -166,6 +249,8 @@ async def update_idadi(
 
     session.add(db_idadi)
 
+    normative_index = await get_normative_index(session)
+    normative_index.resolve_standard_scores(age_in_months, idadi.values)
     for value in idadi.values:
         db_idadi_value: IdadiValues = (await session.scalar(
             select(IdadiValues).where(IdadiValues.id == value.id)
@@ -174,16 +259,6 @@ async def update_idadi(
         if not db_idadi_value:
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Idadi value not found")
 
-        if not value.standard_score:
-            idadi_normative_value: IdadiNormativeTables = await session.scalar(
-                select(IdadiNormativeTables).where(and_(IdadiNormativeTables.initial_age_range <= age_in_months,
-                                                        IdadiNormativeTables.final_age_range >= age_in_months,
-                                                        IdadiNormativeTables.id_domain == value.id_domain,
-                                                        IdadiNormativeTables.raw_score == value.raw_score)
-                                                   )
-            )
-            value.standard_score = idadi_normative_value.standardized if idadi_normative_value else 0
-
         db_idadi_value.raw_score = value.raw_score
         db_idadi_value.standard_score = value.standard_score
         db_idadi_value.id_domain = value.id_domain
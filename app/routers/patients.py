@@ -122,7 +122,7 @@ async def create_upload_file(id_patient: int, session: Session, file: UploadFile
     await session.commit()
 
     image_bytes = await file.read()
-    upload_image_to_minio(image_bytes, file.content_type, image_name, db_patient.id)
+    await upload_image_to_minio(image_bytes, file.content_type, image_name, db_patient.id)
 
 
 @router.delete('/{patient_id}', status_code=HTTPStatus.NO_CONTENT)
@@ -1,49 +1,152 @@
-import gc
 import uuid
 from http import HTTPStatus
+from pathlib import PurePath
 from random import randint
-from typing import List
+from typing import List, Dict, Optional, Tuple
 
 import httpx
 from fastapi import APIRouter, HTTPException, UploadFile
-from sqlalchemy import select, and_, func, update
+from sqlalchemy import select, and_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from taskiq import SendTaskError
 
 from app.models import ProgramsUpload, Psychologist
-from app.routers import Session
-from app.schema.programs_upload import ProgramsUploadSchema, ProgramsUploadGenerateSchema
+from app.models.programs_upload import PROGRAM_KIND_PDF, PROGRAM_KIND_COVER, PROGRAM_STATUS_PENDING, \
+    PROGRAM_STATUS_READY, PROGRAM_STATUS_FAILED
+from app.routers import Session, get_task_status_response
+from app.schema.programs_upload import ProgramsUploadSchema, ProgramsUploadGenerateSchema, ProgramsUploadMoveSchema
 from app.service.minio import upload_file_to_minio, BUCKET_PROGRAMS_NAME, delete_file_from_minio, \
-    get_file_url_from_minio, copy_file_from_minio, get_file_bytes_from_minio
-from app.service.pdf import convert_doc_to_pdf, extract_cover_from_pdf, merge_pdfs, convert_image_to_pdf
+    get_file_url_from_minio, copy_file_from_minio, get_files_etags_from_minio
+from app.service.office import collect_office_stats
+from app.service.programs_cache import unified_pdf_cache_key, find_cached_pdf, record_cache_hit, \
+    record_cache_miss, get_cache_stats
+from app.service.programs_sequence import reorder_sequences, next_sequence, sequence_after, SEQUENCE_GAP
+from app.service.storage import StorageError
+from app.service.thumbnail import thumbnail_kind, closest_thumbnail_size
+from app.settings import settings
+from app.tasks.programs import generate_unified_pdf, convert_program_upload, program_source_location, \
+    SOURCE_KIND_IMAGE, SOURCE_KIND_PDF, SOURCE_KIND_DOC
 
 router = APIRouter(prefix="/programs", tags=["programs"], redirect_slashes=True)
 
 
+def group_programs_by_asset(programs: List[ProgramsUpload],
+                            thumbnail: Optional[str] = None) -> List[ProgramsUploadSchema]:
+    """
+    One schema per asset with the links of its pdf and cover, plus the ``thumbnail`` kind when given.
+    """
+    results: Dict[str, ProgramsUploadSchema] = {}
+    for program in programs:
+        program_schema = results.get(program.asset_uuid)
+        if not program_schema:
+            program_schema = ProgramsUploadSchema.model_validate(program)
+            results[program.asset_uuid] = program_schema
+        if program.status != PROGRAM_STATUS_READY:
+            continue
+        if program.kind == PROGRAM_KIND_PDF:
+            program_schema.pdf = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
+        elif program.kind == PROGRAM_KIND_COVER:
+            program_schema.cover = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
+        elif program.kind == thumbnail:
+            program_schema.thumbnail = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
+    return list(results.values())
+
+
 @router.get("/{id_psychologist}", response_model=List[ProgramsUploadSchema])
-async def find_by_id_psychologist(id_psychologist: int, session: Session):
+async def find_by_id_psychologist(id_psychologist: int, session: Session, size: Optional[int] = None):
+    """
+    ``size`` is the pixel size the client displays covers at; the closest thumbnail is linked as ``thumbnail``.
+    """
+    kinds = [PROGRAM_KIND_PDF, PROGRAM_KIND_COVER]
+    thumbnail = None
+    if size is not None:
+        thumbnail = thumbnail_kind(closest_thumbnail_size(size))
+        kinds.append(thumbnail)
     db_programs = (await session.scalars(
         select(ProgramsUpload).where(
             ProgramsUpload.id_psychologist == id_psychologist).where(ProgramsUpload.generated == False)
+        .where(ProgramsUpload.kind.in_(kinds))
         .order_by(ProgramsUpload.sequence)
     )).all()
 
     if not db_programs:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Resource not exists.")
 
-    results = []
-    for program in db_programs:
-        program_identifier = program.name.split('.')[0]
-        program_schema = filter(lambda p: p.name.split('.')[0] == program_identifier, results)
-        program_schema = next(program_schema, None)
-        if not program_schema:
-            program_schema = ProgramsUploadSchema.model_validate(program)
-            results.append(program_schema)
-        program_link = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-        if program.path.endswith('cover'):
-            program_schema.cover = program_link
-        else:
-            program_schema.pdf = program_link
+    return group_programs_by_asset(db_programs, thumbnail)
+
+
+async def stage_program_upload(session: AsyncSession, id_psychologist: int, filename: str, sequence: int,
+                               source_bytes: bytes, content_type: str) -> List[ProgramsUpload]:
+    """
+    Store a raw upload and add its pending pdf, cover and thumbnail rows; the conversion runs once they are
+    committed.
+    """
+    uuid_str = str(uuid.uuid4())
+    source_name, source_path = program_source_location(id_psychologist, uuid_str)
+    await upload_file_to_minio(source_bytes, content_type, source_name, source_path, BUCKET_PROGRAMS_NAME)
 
-    return results
+    db_programs = [
+        ProgramsUpload(
+            filename=filename,
+            sequence=sequence,
+            name=f'{uuid_str}.pdf',
+            generated=False,
+            id_psychologist=id_psychologist,
+            path=f'{id_psychologist}/{uuid_str}/pdf',
+            asset_uuid=uuid_str,
+            kind=PROGRAM_KIND_PDF,
+            status=PROGRAM_STATUS_PENDING,
+        ),
+        ProgramsUpload(
+            filename=filename,
+            sequence=sequence,
+            name=f'{uuid_str}.{settings.IMAGE_COVER_FORMAT}',
+            generated=False,
+            id_psychologist=id_psychologist,
+            path=f'{id_psychologist}/{uuid_str}/cover',
+            asset_uuid=uuid_str,
+            kind=PROGRAM_KIND_COVER,
+            status=PROGRAM_STATUS_PENDING,
+        ),
+        *(ProgramsUpload(
+            filename=filename,
+            sequence=sequence,
+            name=f'{uuid_str}.{settings.THUMBNAIL_FORMAT}',
+            generated=False,
+            id_psychologist=id_psychologist,
+            path=f'{id_psychologist}/{uuid_str}/{thumbnail_kind(size)}',
+            asset_uuid=uuid_str,
+            kind=thumbnail_kind(size),
+            status=PROGRAM_STATUS_PENDING,
+        ) for size in settings.THUMBNAIL_SIZES),
+    ]
+    session.add_all(db_programs)
+    return db_programs
+
+
+async def enqueue_conversions(session: AsyncSession, id_psychologist: int, stored_files: List[ProgramsUpload],
+                              sources: Dict[str, Tuple[str, Optional[str]]]) -> List[ProgramsUploadSchema]:
+    """
+    Queue one conversion per staged asset; ``sources`` maps asset_uuid to its (source kind, extension).
+    """
+    programs_schema = group_programs_by_asset(stored_files)
+    for index, program_schema in enumerate(programs_schema):
+        source_kind, extension = sources[program_schema.asset_uuid]
+        try:
+            task = await convert_program_upload.kiq(id_psychologist, program_schema.asset_uuid, source_kind,
+                                                    extension)
+        except SendTaskError as e:
+            # Nothing will convert the assets left, so they must not stay pending; deleting a failed asset also
+            # removes its raw source
+            await session.execute(
+                update(ProgramsUpload).where(ProgramsUpload.asset_uuid.in_(
+                    [schema.asset_uuid for schema in programs_schema[index:]]
+                )).values(status=PROGRAM_STATUS_FAILED)
+            )
+            await session.commit()
+            raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=e.as_str())
+        program_schema.task_id = task.task_id
+    return programs_schema
 
 
 @router.post("/upload/image/{id_psychologist}", status_code=HTTPStatus.CREATED,
@@ -63,70 +166,20 @@ async def create_upload_file_image(id_psychologist: int, session: Session, files
         extension = file.filename.rsplit('.', 1)[1].lower()
         if extension not in ['jpg', 'jpeg', 'png']:
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f'Invalid file extension {extension}.')
-    max_sequence = await session.scalar(
-        select(func.max(ProgramsUpload.sequence)).where(ProgramsUpload.id_psychologist == id_psychologist)
-    )
-    if max_sequence is None:
-        max_sequence = 0
-    else:
-        max_sequence += 1
+    sequence = await next_sequence(session, id_psychologist)
 
     stored_files = []
+    sources = {}
     for file in files:
-        filename = file.filename.rsplit('.', 1)[0].lower()
-        pdf_bytes = None
-        img_bytes = await file.read()
-        try:
-            pdf_bytes = convert_image_to_pdf(img_bytes)
-        except HTTPException as e:
-            for db_program in stored_files:
-                delete_file_from_minio(db_program.name, db_program.path, BUCKET_PROGRAMS_NAME)
-            raise e
-
-        uuid_str = str(uuid.uuid4())
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.pdf',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/pdf',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-
-        upload_file_to_minio(pdf_bytes, 'application/pdf', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
-
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.png',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/cover',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-        max_sequence += 1
-        upload_file_to_minio(img_bytes, 'image/png', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
+        filename, extension = file.filename.rsplit('.', 1)
+        db_programs = await stage_program_upload(session, id_psychologist, filename.lower(), sequence,
+                                                 await file.read(), file.content_type or 'application/octet-stream')
+        stored_files.extend(db_programs)
+        sources[db_programs[0].asset_uuid] = (SOURCE_KIND_IMAGE, extension.lower())
+        sequence += SEQUENCE_GAP
 
     await session.commit()
-    results = []
-    for program in stored_files:
-        program_identifier = program.name.split('.')[0]
-        program_schema = filter(lambda p: p.name.split('.')[0] == program_identifier, results)
-        program_schema = next(program_schema, None)
-        if not program_schema:
-            program_schema = ProgramsUploadSchema.model_validate(program)
-            results.append(program_schema)
-        program_link = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-        if program.path.endswith('cover'):
-            program_schema.cover = program_link
-        else:
-            program_schema.pdf = program_link
-    return results
+    return await enqueue_conversions(session, id_psychologist, stored_files, sources)
 
 
 @router.post("/upload/image-link/{id_psychologist}", status_code=HTTPStatus.CREATED,
@@ -171,70 +224,20 @@ async def create_upload_url_image(id_psychologist: int, urls: List[str], session
         if not is_image:
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f'Invalid file, just images are supported.')
 
-    images = list(map(lambda image: image['bytes'], images))
-    max_sequence = await session.scalar(
-        select(func.max(ProgramsUpload.sequence)).where(ProgramsUpload.id_psychologist == id_psychologist)
-    )
-    if max_sequence is None:
-        max_sequence = 0
-    else:
-        max_sequence += 1
+    sequence = await next_sequence(session, id_psychologist)
 
     stored_files = []
-    for image_bytes in images:
-        pdf_bytes = None
-        try:
-            pdf_bytes = convert_image_to_pdf(image_bytes)
-        except HTTPException as e:
-            for db_program in stored_files:
-                delete_file_from_minio(db_program.name, db_program.path, BUCKET_PROGRAMS_NAME)
-            raise e
-
-        uuid_str = str(uuid.uuid4())
+    sources = {}
+    for image in images:
         filename = f'documment_{randint(1000000000, 9999999999)}'
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.pdf',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/pdf',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-
-        upload_file_to_minio(pdf_bytes, 'application/pdf', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
-
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.png',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/cover',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-        max_sequence += 1
-        upload_file_to_minio(image_bytes, 'image/png', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
+        db_programs = await stage_program_upload(session, id_psychologist, filename, sequence, image['bytes'],
+                                                 image['content_type'])
+        stored_files.extend(db_programs)
+        sources[db_programs[0].asset_uuid] = (SOURCE_KIND_IMAGE, None)
+        sequence += SEQUENCE_GAP
 
     await session.commit()
-    results = []
-    for program in stored_files:
-        program_identifier = program.name.split('.')[0]
-        program_schema = filter(lambda p: p.name.split('.')[0] == program_identifier, results)
-        program_schema = next(program_schema, None)
-        if not program_schema:
-            program_schema = ProgramsUploadSchema.model_validate(program)
-            results.append(program_schema)
-        program_link = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-        if program.path.endswith('cover'):
-            program_schema.cover = program_link
-        else:
-            program_schema.pdf = program_link
-    return results
+    return await enqueue_conversions(session, id_psychologist, stored_files, sources)
 
 
 @router.post("/upload/pdf/{id_psychologist}", status_code=HTTPStatus.CREATED, response_model=List[ProgramsUploadSchema])
@@ -253,80 +256,24 @@ async def create_upload_file_pdf(id_psychologist: int, session: Session, files:
         extension = file.filename.rsplit('.', 1)[1].lower()
         if extension not in ['doc', 'docx', 'pdf']:
             raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f'Invalid file extension {extension}.')
-    max_sequence = await session.scalar(
-        select(func.max(ProgramsUpload.sequence)).where(ProgramsUpload.id_psychologist == id_psychologist)
-    )
-    if max_sequence is None:
-        max_sequence = 0
-    else:
-        max_sequence += 1
+    sequence = await next_sequence(session, id_psychologist)
+
     stored_files = []
+    sources = {}
     for file in files:
-        filename = file.filename.rsplit('.', 1)[0].lower()
-        extension = file.filename.rsplit('.', 1)[1].lower()
-        pdf_bytes = None
-        if extension in ['doc', 'docx']:
-            doc_bytes = await file.read()
-            try:
-                pdf_bytes = convert_doc_to_pdf(doc_bytes, extension)
-            except HTTPException as e:
-                for db_program in stored_files:
-                    delete_file_from_minio(db_program.name, db_program.path, BUCKET_PROGRAMS_NAME)
-                raise e
-
-        uuid_str = str(uuid.uuid4())
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.pdf',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/pdf',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-
-        if not pdf_bytes:
-            pdf_bytes = await file.read()
-        upload_file_to_minio(pdf_bytes, 'application/pdf', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
-
-        if not pdf_bytes:
-            await file.seek(0)
-            pdf_bytes = await file.read()
-        cover_bytes = extract_cover_from_pdf(pdf_bytes)
-        db_program = ProgramsUpload(
-            filename=filename,
-            sequence=max_sequence,
-            name=f'{uuid_str}.png',
-            generated=False,
-            id_psychologist=id_psychologist,
-            path=f'{id_psychologist}/{uuid_str}/cover',
-        )
-        session.add(db_program)
-        stored_files.append(db_program)
-        max_sequence += 1
-        upload_file_to_minio(cover_bytes, 'image/png', db_program.name, db_program.path,
-                             BUCKET_PROGRAMS_NAME)
+        filename, extension = file.filename.rsplit('.', 1)
+        extension = extension.lower()
+        db_programs = await stage_program_upload(session, id_psychologist, filename.lower(), sequence,
+                                                 await file.read(), file.content_type or 'application/octet-stream')
+        stored_files.extend(db_programs)
+        sources[db_programs[0].asset_uuid] = (SOURCE_KIND_PDF if extension == 'pdf' else SOURCE_KIND_DOC, extension)
+        sequence += SEQUENCE_GAP
 
     await session.commit()
-    results = []
-    for program in stored_files:
-        program_identifier = program.name.split('.')[0]
-        program_schema = filter(lambda p: p.name.split('.')[0] == program_identifier, results)
-        program_schema = next(program_schema, None)
-        if not program_schema:
-            program_schema = ProgramsUploadSchema.model_validate(program)
-            results.append(program_schema)
-        program_link = get_file_url_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-        if program.path.endswith('cover'):
-            program_schema.cover = program_link
-        else:
-            program_schema.pdf = program_link
-    return results
+    return await enqueue_conversions(session, id_psychologist, stored_files, sources)
 
 
-@router.post("/generate/{id_psychologist}", status_code=HTTPStatus.CREATED, response_model=ProgramsUploadSchema)
+@router.post("/generate/{id_psychologist}", status_code=HTTPStatus.CREATED)
 async def get_unified_pdf(id_psychologist: int, files: List[ProgramsUploadGenerateSchema], session: Session):
     if any(p.name is None for p in files) or any(p.sequence is None for p in files):
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="sequence and name are required for all files.")
@@ -339,78 +286,73 @@ async def get_unified_pdf(id_psychologist: int, files: List[ProgramsUploadGenera
     if not db_programs:
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Empty report.")
 
-    db_names = sorted(set(map(lambda p: (p.name, p.sequence), db_programs)), key=lambda x: x[1])
-    uploaded_names = list(map(lambda p: (p.name, p.sequence), files))
-    db_program_generated = await session.scalar(
-        select(ProgramsUpload).where(
-            and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.generated == True))
-    )
+    db_order = list(dict.fromkeys(p.asset_uuid for p in sorted(db_programs, key=lambda p: p.sequence)))
+    uploaded_order = list(dict.fromkeys(f.name.split('.')[0] for f in sorted(files, key=lambda f: f.sequence)))
+    if db_order != uploaded_order:
+        await reorder_sequences(session, id_psychologist,
+                                {asset_uuid: (i + 1) * SEQUENCE_GAP for i, asset_uuid in enumerate(uploaded_order)})
 
-    programs_changed = db_names != uploaded_names
-    report_generated = db_program_generated is not None
-
-    if programs_changed and report_generated:
-        programs = (await session.scalars(
-            select(ProgramsUpload).where(
-                and_(ProgramsUpload.generated == True, ProgramsUpload.id_psychologist == id_psychologist))
-        )).all()
-        for program in programs:
-            delete_file_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-            await session.delete(program)
-    should_generate = programs_changed or not report_generated
-
-    if not should_generate:
-        db_program_generated = await session.scalar(
-            select(ProgramsUpload).where(
-                and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.generated == True))
-        )
+    sources = (await session.execute(
+        select(ProgramsUpload.name, ProgramsUpload.path).where(
+            and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.generated == False,
+                 ProgramsUpload.kind == PROGRAM_KIND_PDF, ProgramsUpload.status == PROGRAM_STATUS_READY))
+        .order_by(ProgramsUpload.sequence.asc())
+    )).all()
+    if not sources:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Empty report.")
+    sources = [(name, path) for name, path in sources]
+    try:
+        etags = await get_files_etags_from_minio(sources, BUCKET_PROGRAMS_NAME)
+    except StorageError as e:
+        raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=f"Erro no MinIO: {e}")
+    cache_key = unified_pdf_cache_key(id_psychologist, etags)
+
+    db_program_generated = await find_cached_pdf(session, id_psychologist, cache_key)
+    await session.commit()
+
+    if db_program_generated:
+        await record_cache_hit()
         program_schema = ProgramsUploadSchema.model_validate(db_program_generated)
         program_link = get_file_url_from_minio(db_program_generated.name, db_program_generated.path,
                                                BUCKET_PROGRAMS_NAME)
         program_schema.pdf = program_link
-        return program_schema
-
-    for file in files:
-        name = file.name.split('.')[0]
-        await session.execute(
-            update(ProgramsUpload)
-            .where(ProgramsUpload.name.startswith(name))
-            .values(sequence=file.sequence)
+        return {
+            'task_id': None,
+            'status': 'done',
+            'result': program_schema
+        }
+    await record_cache_miss()
+
+    try:
+        task_result = await generate_unified_pdf.kiq(
+            id_psychologist, cache_key, [(name, path, etag) for (name, path), etag in zip(sources, etags)]
         )
+    except SendTaskError as e:
+        raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=e.as_str())
+    return {
+        'task_id': task_result.task_id,
+        'status': 'processing'
+    }
 
-    db_programs = (await session.scalars(
-        select(ProgramsUpload).where(
-            and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.path.endswith('pdf')))
-        .order_by(ProgramsUpload.sequence.asc())
-    )).all()
 
-    pdf_bytes_list = []
-    for program in db_programs:
-        pdf_bytes = get_file_bytes_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-        pdf_bytes_list.append(pdf_bytes)
-    final_pdf = merge_pdfs(pdf_bytes_list)
-    uuid_str = str(uuid.uuid4())
-    filename = 'report'
-    db_program_generated = ProgramsUpload(
-        filename=filename,
-        sequence=-1,
-        name=f'{uuid_str}.pdf',
-        generated=True,
-        id_psychologist=id_psychologist,
-        path=f'{id_psychologist}/{uuid_str}/pdf',
-    )
-    session.add(db_program_generated)
-    upload_file_to_minio(final_pdf, 'application/pdf', db_program_generated.name, db_program_generated.path,
-                         BUCKET_PROGRAMS_NAME)
-    await session.commit()
-    program_generated_schema = ProgramsUploadSchema.model_validate(db_program_generated)
-    generated_link = get_file_url_from_minio(db_program_generated.name, db_program_generated.path, BUCKET_PROGRAMS_NAME)
-    program_generated_schema.pdf = generated_link
-    del pdf_bytes
-    del pdf_bytes_list
-    del final_pdf
-    gc.collect()
-    return program_generated_schema
+@router.get('/upload/status/{task_id}')
+async def status_program_upload(task_id: str):
+    return await get_task_status_response(task_id)
+
+
+@router.get('/generate/status/{task_id}')
+async def status_unified_pdf(task_id: str):
+    return await get_task_status_response(task_id)
+
+
+@router.get('/cache/stats')
+async def unified_pdf_cache_stats():
+    return await get_cache_stats()
+
+
+@router.get('/office/stats')
+async def office_pool_stats():
+    return await collect_office_stats()
 
 
 @router.delete('/{id_program_upload}', status_code=HTTPStatus.NO_CONTENT)
@@ -424,82 +366,74 @@ async def delete_program_upload(
 
     if not db_program_upload:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Resource not exists.")
-    name = db_program_upload.name.split('.')[0]
-
     db_programs = (await session.scalars(
-        select(ProgramsUpload).where(ProgramsUpload.name.startswith(name))
+        select(ProgramsUpload).where(ProgramsUpload.asset_uuid == db_program_upload.asset_uuid)
     )).all()
     for program in db_programs:
         await session.delete(program)
-        delete_file_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
-
-    db_program_generated = await session.scalar(
-        select(ProgramsUpload).where(
-            and_(ProgramsUpload.id_psychologist == db_programs[0].id_psychologist, ProgramsUpload.generated == True))
-    )
-    if db_program_generated:
-        await session.delete(db_program_generated)
-        delete_file_from_minio(db_program_generated.name, db_program_generated.path, BUCKET_PROGRAMS_NAME)
-
-    deleted_sequence = db_program_upload.sequence
-    next_programs = (await session.scalars(
-        select(ProgramsUpload).where(ProgramsUpload.sequence > deleted_sequence)
-    )).all()
-    for program in next_programs:
-        program.sequence = program.sequence - 1
+        await delete_file_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
+    if db_program_upload.status == PROGRAM_STATUS_FAILED:
+        # Failed uploads keep their raw source; pending ones are cleaned up by their conversion task
+        await delete_file_from_minio(*program_source_location(db_program_upload.id_psychologist,
+                                                              db_program_upload.asset_uuid), BUCKET_PROGRAMS_NAME)
     await session.commit()
 
 
 @router.post('/duplicate/{id_program_upload}', status_code=HTTPStatus.CREATED)
 async def duplicate_program(id_program_upload: int, session: Session):
-    sub_query = select(func.split_part(ProgramsUpload.name, '.', 1)).where(
-        ProgramsUpload.id == id_program_upload)
+    sub_query = select(ProgramsUpload.asset_uuid).where(ProgramsUpload.id == id_program_upload)
 
     db_programs_upload = (await session.scalars(
-        select(ProgramsUpload).where(
-            func.split_part(ProgramsUpload.name, '.', 1).like(
-                sub_query.scalar_subquery()
-            )
-        )
+        select(ProgramsUpload).where(ProgramsUpload.asset_uuid == sub_query.scalar_subquery())
     )).all()
 
     if not db_programs_upload:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Resource not exists.")
+    if any(p.status != PROGRAM_STATUS_READY for p in db_programs_upload):
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail="Program is still being converted.")
 
-    current_sequence = db_programs_upload[0].sequence
+    new_sequence = await sequence_after(session, db_programs_upload[0].id_psychologist,
+                                        db_programs_upload[0].asset_uuid)
 
-    db_next_programs = (await session.scalars(
-        select(ProgramsUpload).where(ProgramsUpload.sequence > current_sequence)
-    )).all()
+    uuid_str = str(uuid.uuid4())
+    for db_program_upload in db_programs_upload:
+        db_program = ProgramsUpload(
+            filename=db_program_upload.filename,
+            sequence=new_sequence,
+            name=f'{uuid_str}{PurePath(db_program_upload.name).suffix}',
+            generated=False,
+            id_psychologist=db_program_upload.id_psychologist,
+            path=f'{db_program_upload.id_psychologist}/{uuid_str}/{db_program_upload.kind}',
+            asset_uuid=uuid_str,
+            kind=db_program_upload.kind,
+        )
+        session.add(db_program)
+        await copy_file_from_minio(db_program_upload.name, db_program_upload.path, db_program.name,
+                                   db_program.path, BUCKET_PROGRAMS_NAME)
 
-    for program in db_next_programs:
-        program.sequence = program.sequence + 1
+    await session.commit()
 
-    uuid_str = str(uuid.uuid4())
-    db_programs_upload_pdf: ProgramsUpload = next(filter(lambda p: 'pdf' in p.path, db_programs_upload))
-    db_programs_upload_cover: ProgramsUpload = next(filter(lambda p: 'cover' in p.path, db_programs_upload))
-    db_program = ProgramsUpload(
-        filename=db_programs_upload_pdf.filename,
-        sequence=current_sequence + 1,
-        name=f'{uuid_str}.pdf',
-        generated=False,
-        id_psychologist=db_programs_upload_pdf.id_psychologist,
-        path=f'{db_programs_upload_pdf.id_psychologist}/{uuid_str}/pdf',
-    )
-    session.add(db_program)
-    copy_file_from_minio(db_programs_upload_pdf.name, db_programs_upload_pdf.path, db_program.name, db_program.path,
-                         BUCKET_PROGRAMS_NAME)
-
-    db_program = ProgramsUpload(
-        filename=db_programs_upload_cover.filename,
-        sequence=current_sequence + 1,
-        name=f'{uuid_str}.png',
-        generated=False,
-        id_psychologist=db_programs_upload_cover.id_psychologist,
-        path=f'{db_programs_upload_cover.id_psychologist}/{uuid_str}/cover',
+
+@router.put('/move/{id_program_upload}', status_code=HTTPStatus.NO_CONTENT)
+async def move_program(id_program_upload: int, move: ProgramsUploadMoveSchema, session: Session):
+    # Unified reports are cache entries outside the sequence; they can neither move nor be moved after
+    db_program_upload = await session.scalar(
+        select(ProgramsUpload).where(and_(ProgramsUpload.id == id_program_upload, ProgramsUpload.generated == False))
     )
-    session.add(db_program)
-    copy_file_from_minio(db_programs_upload_cover.name, db_programs_upload_cover.path, db_program.name, db_program.path,
-                         BUCKET_PROGRAMS_NAME)
+    if not db_program_upload:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Resource not exists.")
+
+    previous_asset_uuid = None
+    if move.id_previous is not None:
+        previous_asset_uuid = await session.scalar(
+            select(ProgramsUpload.asset_uuid).where(
+                and_(ProgramsUpload.id == move.id_previous,
+                     ProgramsUpload.id_psychologist == db_program_upload.id_psychologist,
+                     ProgramsUpload.generated == False))
+        )
+        if not previous_asset_uuid:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Previous program not exists.")
 
+    new_sequence = await sequence_after(session, db_program_upload.id_psychologist, previous_asset_uuid)
+    await reorder_sequences(session, db_program_upload.id_psychologist, {db_program_upload.asset_uuid: new_sequence})
     await session.commit()
@@ -3,7 +3,8 @@ from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
 
-from app.schema.idadi_values import IdadiValuesSchema, IdadiValuesInsertSchema, IdadiValuesUpdateSchema
+from app.schema.idadi_values import IdadiValuesSchema, IdadiValuesInsertSchema, IdadiValuesUpdateSchema, \
+    IdadiValuesProfileSchema
 
 
 class IdadiSchema(BaseModel):
@@ -38,3 +39,26 @@ class IdadiUpdateSchema(BaseModel):
     values: list[IdadiValuesUpdateSchema]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class IdadiBatchResultSchema(BaseModel):
+    index: int
+    id_patient: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class IdadiProfileInsertSchema(BaseModel):
+    protocol_age: int
+
+    values: list[IdadiValuesInsertSchema]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class IdadiProfileSchema(BaseModel):
+    protocol_age: int
+
+    values: list[IdadiValuesProfileSchema]
+
+    model_config = ConfigDict(from_attributes=True)
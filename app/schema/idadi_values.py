@@ -32,3 +32,17 @@ class IdadiValuesUpdateSchema(BaseModel):
     id_domain: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class IdadiValuesProfileSchema(BaseModel):
+    id_domain: int
+    raw_score: int
+    developmental_score: Optional[float] = None
+    lower_confidence_interval: Optional[float] = None
+    upper_confidence_interval: Optional[float] = None
+    z: Optional[float] = None
+    standardized: Optional[int] = None
+    see: Optional[float] = None
+    information: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
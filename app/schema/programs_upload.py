@@ -9,6 +9,9 @@ class ProgramsUploadSchema(BaseModel):
     name: str
     filename: str
     path: str
+    asset_uuid: str
+    kind: str
+    status: str
     sequence: int
     generated: bool
     id_psychologist: int
@@ -16,6 +19,8 @@ class ProgramsUploadSchema(BaseModel):
     updated_at: datetime
     cover: Optional[str] = None
     pdf: Optional[str] = None
+    thumbnail: Optional[str] = None
+    task_id: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -48,3 +53,9 @@ class ProgramsUploadGenerateSchema(BaseModel):
     sequence: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ProgramsUploadMoveSchema(BaseModel):
+    id_previous: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+
+
+def get_compute_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by the CPU-bound PDF and image transforms, created on first use.
+
+    Children come from a forkserver, which ``max_tasks_per_child`` requires and which keeps them from inheriting
+    the parent's event loop and connections.
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        max_workers = settings.COMPUTE_MAX_WORKERS or os.cpu_count()
+        _EXECUTOR = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('forkserver'),
+            max_tasks_per_child=settings.COMPUTE_MAX_TASKS_PER_CHILD or None,
+        )
+        logger.info('Compute pool started with %d processes', max_workers)
+    return _EXECUTOR
+
+
+async def run_in_process(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a picklable, module-level ``func`` on the compute pool without blocking the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_compute_executor(),
+                                                            functools.partial(func, *args, **kwargs))
+
+
+def shutdown_compute_executor():
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=True, cancel_futures=True)
+        _EXECUTOR = None
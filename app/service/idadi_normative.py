@@ -0,0 +1,161 @@
+import time
+from asyncio import Lock
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, event, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import IdadiNormativeTables
+
+NORMATIVE_COLUMNS = ('developmental_score', 'lower_confidence_interval', 'upper_confidence_interval', 'z',
+                     'standardized', 'see', 'information')
+NORMATIVE_INDEX_CHECK_INTERVAL = 30
+
+
+class IdadiNormativeIndex:
+    """
+    Columnar view of ``idadi_normative_tables``.
+
+    Each (domain, age band) is stored as a dense slice of flat column arrays indexed by raw score, and
+    ``_band_offset[id_domain, age_in_months]`` points at the start of that slice, so any batch of
+    (domain, age, raw score) triples resolves with plain array indexing.
+    """
+
+    def __init__(self, rows: Sequence):
+        bands: Dict[tuple, list] = {}
+        for row in rows:
+            bands.setdefault((row.id_domain, row.initial_age_range, row.final_age_range), []).append(row)
+
+        max_domain = max((band[0] for band in bands), default=0)
+        max_age = max((band[2] for band in bands), default=0)
+        self._band_offset = np.full((max_domain + 1, max_age + 1), -1, dtype=np.int64)
+        self._band_length = np.zeros((max_domain + 1, max_age + 1), dtype=np.int64)
+
+        # One spare slot keeps lookups on an empty table in bounds; it is never marked present
+        size = sum(max(row.raw_score for row in band_rows) + 1 for band_rows in bands.values()) + 1
+        self._present = np.zeros(size, dtype=bool)
+        self._columns = {column: np.zeros(size, dtype=np.float64) for column in NORMATIVE_COLUMNS}
+        self._columns['standardized'] = np.zeros(size, dtype=np.int64)
+
+        offset = 0
+        for (id_domain, initial_age_range, final_age_range), band_rows in bands.items():
+            length = max(row.raw_score for row in band_rows) + 1
+            self._band_offset[id_domain, initial_age_range:final_age_range + 1] = offset
+            self._band_length[id_domain, initial_age_range:final_age_range + 1] = length
+            positions = offset + np.fromiter((row.raw_score for row in band_rows), dtype=np.int64)
+            self._present[positions] = True
+            for column, values in self._columns.items():
+                values[positions] = [getattr(row, column) for row in band_rows]
+            offset += length
+
+    def __len__(self):
+        return int(self._present.sum())
+
+    def lookup(self, id_domains, ages_in_months, raw_scores) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the flat positions of each (domain, age, raw score) triple and a mask of the ones found.
+        """
+        id_domains, ages_in_months, raw_scores = np.broadcast_arrays(
+            np.asarray(id_domains, dtype=np.int64),
+            np.asarray(ages_in_months, dtype=np.int64),
+            np.asarray(raw_scores, dtype=np.int64),
+        )
+        in_range = ((id_domains >= 0) & (id_domains < self._band_offset.shape[0]) &
+                    (ages_in_months >= 0) & (ages_in_months < self._band_offset.shape[1]))
+        id_domains = np.where(in_range, id_domains, 0)
+        ages_in_months = np.where(in_range, ages_in_months, 0)
+
+        offsets = self._band_offset[id_domains, ages_in_months]
+        lengths = self._band_length[id_domains, ages_in_months]
+        found = in_range & (offsets >= 0) & (raw_scores >= 0) & (raw_scores < lengths)
+        positions = np.where(found, offsets + raw_scores, 0)
+        found &= self._present[positions]
+        return positions, found
+
+    def standardized(self, id_domain: int, age_in_months: int, raw_score: int) -> Optional[int]:
+        positions, found = self.lookup([id_domain], age_in_months, [raw_score])
+        return int(self._columns['standardized'][positions[0]]) if found[0] else None
+
+    def resolve_standard_scores(self, age_in_months: int, values: Iterable) -> None:
+        """
+        Fill ``standard_score`` of every value that has none, falling back to 0 like the original queries.
+        """
+        pending = [value for value in values if not value.standard_score]
+        if not pending:
+            return
+        positions, found = self.lookup([value.id_domain for value in pending], age_in_months,
+                                       [value.raw_score for value in pending])
+        standardized = np.where(found, self._columns['standardized'][positions], 0)
+        for value, standard_score in zip(pending, standardized.tolist()):
+            value.standard_score = standard_score
+
+    def profile(self, age_in_months: int, id_domains: Sequence[int], raw_scores: Sequence[int]) -> list[dict]:
+        """
+        Every normative column for each (domain, raw score) of a protocol; columns are None when not found.
+        """
+        positions, found = self.lookup(id_domains, age_in_months, raw_scores)
+        columns = {column: values[positions].tolist() for column, values in self._columns.items()}
+        found = found.tolist()
+        return [
+            {
+                'id_domain': id_domain,
+                'raw_score': raw_score,
+                **{column: columns[column][i] if found[i] else None for column in NORMATIVE_COLUMNS},
+            }
+            for i, (id_domain, raw_score) in enumerate(zip(id_domains, raw_scores))
+        ]
+
+
+_NORMATIVE_INDEX: Optional[IdadiNormativeIndex] = None
+_NORMATIVE_INDEX_VERSION: Optional[tuple] = None
+_NORMATIVE_INDEX_CHECKED_AT = 0.0
+_NORMATIVE_INDEX_LOCK = Lock()
+
+
+async def _normative_version(session: AsyncSession) -> tuple:
+    return tuple(await session.execute(
+        select(func.count(), func.max(IdadiNormativeTables.updated_at))
+    ).one())
+
+
+def _index_is_fresh() -> bool:
+    return _NORMATIVE_INDEX is not None and \
+        time.monotonic() - _NORMATIVE_INDEX_CHECKED_AT < NORMATIVE_INDEX_CHECK_INTERVAL
+
+
+async def get_normative_index(session: AsyncSession) -> IdadiNormativeIndex:
+    """
+    The cached index, rebuilt when the table's row count or latest ``updated_at`` changed. Writes made outside
+    this process (migrations, other workers) are noticed within ``NORMATIVE_INDEX_CHECK_INTERVAL`` seconds.
+    """
+    global _NORMATIVE_INDEX, _NORMATIVE_INDEX_VERSION, _NORMATIVE_INDEX_CHECKED_AT
+    if _index_is_fresh():
+        return _NORMATIVE_INDEX
+
+    async with _NORMATIVE_INDEX_LOCK:
+        if _index_is_fresh():
+            return _NORMATIVE_INDEX
+        version = await _normative_version(session)
+        if _NORMATIVE_INDEX is None or version != _NORMATIVE_INDEX_VERSION:
+            rows = (await session.execute(
+                select(IdadiNormativeTables.id_domain,
+                       IdadiNormativeTables.initial_age_range,
+                       IdadiNormativeTables.final_age_range,
+                       IdadiNormativeTables.raw_score,
+                       *(getattr(IdadiNormativeTables, column) for column in NORMATIVE_COLUMNS))
+            )).all()
+            _NORMATIVE_INDEX = IdadiNormativeIndex(rows)
+            _NORMATIVE_INDEX_VERSION = version
+        _NORMATIVE_INDEX_CHECKED_AT = time.monotonic()
+    return _NORMATIVE_INDEX
+
+
+def invalidate_normative_index(*_) -> None:
+    global _NORMATIVE_INDEX
+    _NORMATIVE_INDEX = None
+
+
+# ORM writes in this process drop the index right away; any other change is caught by the version check.
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(IdadiNormativeTables, _event_name, invalidate_normative_index)
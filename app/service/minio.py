@@ -1,25 +1,48 @@
-import io
+import asyncio
+import logging
+import time
 from datetime import timedelta, datetime, timezone
 from http import HTTPStatus
-from io import BytesIO
-from typing import Any
+from pathlib import Path
+from typing import Any, AsyncIterable, Awaitable, BinaryIO, Callable, List, Optional, Tuple
 
 from fastapi import HTTPException
-from minio import Minio, S3Error
-from minio.commonconfig import CopySource, Filter
+from minio import Minio
+from minio.commonconfig import Filter
 from minio.lifecycleconfig import LifecycleConfig, Rule, Expiration
 from app.service.minio_patch import presigned_get_object
+from app.service.s3 import AsyncS3Client
+from app.service.storage import StorageBackend, MinioThreadBackend, HttpxS3Backend, StorageError
 
 Minio.presigned_get_object = presigned_get_object
 
 from app.settings import settings
 
+logger = logging.getLogger(__name__)
+
 MINIO_CLIENT = Minio(
     settings.MINIO_HOST,
     access_key=settings.MINIO_ACCESS_KEY,
     secret_key=settings.MINIO_SECRET_KEY,
     secure=False
 )
+
+
+def _create_storage_backend() -> StorageBackend:
+    if settings.STORAGE_BACKEND == 'httpx':
+        return HttpxS3Backend(AsyncS3Client(
+            settings.MINIO_HOST,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            region=settings.MINIO_REGION,
+            max_connections=settings.STORAGE_MAX_CONNECTIONS,
+        ))
+    return MinioThreadBackend(MINIO_CLIENT, settings.MINIO_MAX_WORKERS)
+
+
+# The Minio client above is kept for bucket setup and presigned URLs; object I/O goes through the backend.
+STORAGE_BACKEND = _create_storage_backend()
+
 BUCKET_PHOTO_NAME = "photos"
 BUCKET_PROGRAMS_NAME = "programs"
 BUCKET_IDADI_NAME = "idadi"
@@ -42,27 +65,38 @@ if not MINIO_CLIENT.bucket_exists(BUCKET_IDADI_NAME):
     ]))
 
 
-def upload_image_to_minio(file: bytes, content_type: str, image_name: str, image_path: str,
-                          bucket_name: str = BUCKET_PHOTO_NAME):
+async def upload_image_to_minio(file: bytes, content_type: str, image_name: str, image_path: str,
+                                bucket_name: str = BUCKET_PHOTO_NAME):
     if not content_type.startswith("image/"):
         raise HTTPException(HTTPStatus.BAD_REQUEST, detail="Apenas imagens são permitidas!")
 
-    upload_file_to_minio(file, content_type, image_name, image_path, bucket_name)
+    await upload_file_to_minio(file, content_type, image_name, image_path, bucket_name)
 
 
-def upload_file_to_minio(file_bytes: bytes, content_type: str, file_name: str, file_path: str, bucket_name: str):
-    file_bytes: BytesIO = io.BytesIO(file_bytes)
+async def upload_file_to_minio(file_bytes: bytes, content_type: str, file_name: str, file_path: str,
+                               bucket_name: str):
     filename = f"{file_path}/{file_name}"
     try:
-        MINIO_CLIENT.put_object(
-            bucket_name,
-            filename,
-            file_bytes,
-            length=-1,
-            part_size=10 * 1024 * 1024,
-            content_type=content_type
-        )
-    except S3Error as e:
+        await STORAGE_BACKEND.put_object(bucket_name, filename, file_bytes, content_type)
+    except StorageError as e:
+        raise HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR, detail=f"Erro no MinIO: {e}")
+
+
+async def upload_fileobj_to_minio(file: BinaryIO, content_type: str, file_name: str, file_path: str,
+                                  bucket_name: str):
+    filename = f"{file_path}/{file_name}"
+    try:
+        await STORAGE_BACKEND.upload_from_file(bucket_name, filename, file, content_type)
+    except StorageError as e:
+        raise HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR, detail=f"Erro no MinIO: {e}")
+
+
+async def upload_stream_to_minio(chunks: AsyncIterable[bytes], content_type: str, file_name: str, file_path: str,
+                                 bucket_name: str):
+    filename = f"{file_path}/{file_name}"
+    try:
+        await STORAGE_BACKEND.upload_stream(bucket_name, filename, chunks, content_type)
+    except StorageError as e:
         raise HTTPException(HTTPStatus.INTERNAL_SERVER_ERROR, detail=f"Erro no MinIO: {e}")
 
 
@@ -76,23 +110,61 @@ def get_file_url_from_minio(file_name: str, file_path: Any, bukect_name: str = B
     return url
 
 
-def get_file_bytes_from_minio(file_name: str, file_path: Any, bukect_name: str = BUCKET_PHOTO_NAME):
-    return MINIO_CLIENT.get_object(
-        bukect_name,
-        f"{file_path}/{file_name}",
-    ).read()
+async def get_file_bytes_from_minio(file_name: str, file_path: Any, bukect_name: str = BUCKET_PHOTO_NAME):
+    return await STORAGE_BACKEND.get_object(bukect_name, f"{file_path}/{file_name}")
 
 
-def copy_file_from_minio(file_name_from: str, file_path_from: str, file_name_to: str, file_path_to: str,
-                         bucket_name: str = BUCKET_PHOTO_NAME):
-    obj = MINIO_CLIENT.copy_object(
-        bucket_name,
-        f"{file_path_to}/{file_name_to}",
-        CopySource(bucket_name, f"{file_path_from}/{file_name_from}")
-    )
-    return obj
+async def download_files_from_minio(files: List[Tuple[str, Any]], directory: str,
+                                    bukect_name: str = BUCKET_PHOTO_NAME,
+                                    concurrency: int = settings.STORAGE_FETCH_CONCURRENCY,
+                                    on_fetched: Optional[Callable[[Path], Awaitable]] = None) -> List[Path]:
+    """
+    Stream many (file_name, file_path) objects into files under ``directory``, with at most ``concurrency`` in
+    flight. The returned paths keep the input order; ``on_fetched`` is awaited as each download finishes.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(index: int, file_name: str, file_path: Any) -> Path:
+        local_path = Path(directory, f'{index}_{file_name}')
+        async with semaphore:
+            started = time.perf_counter()
+            with local_path.open('wb') as file:
+                await STORAGE_BACKEND.download_to_file(bukect_name, f"{file_path}/{file_name}", file)
+            logger.info('Fetched %s/%s/%s (%d bytes) in %.3fs', bukect_name, file_path, file_name,
+                        local_path.stat().st_size, time.perf_counter() - started)
+        if on_fetched:
+            await on_fetched(local_path)
+        return local_path
+
+    started = time.perf_counter()
+    local_paths = await asyncio.gather(*(fetch(index, file_name, file_path)
+                                         for index, (file_name, file_path) in enumerate(files)))
+    logger.info('Fetched %d objects (%d bytes) from %s in %.3fs with concurrency %d', len(local_paths),
+                sum(path.stat().st_size for path in local_paths), bukect_name, time.perf_counter() - started,
+                concurrency)
+    return local_paths
+
+
+async def get_files_etags_from_minio(files: List[Tuple[str, Any]], bukect_name: str = BUCKET_PHOTO_NAME,
+                                     concurrency: int = settings.STORAGE_FETCH_CONCURRENCY) -> List[str]:
+    """
+    ETags of many (file_name, file_path) objects, in the input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def stat(file_name: str, file_path: Any) -> str:
+        async with semaphore:
+            return await STORAGE_BACKEND.stat_object(bukect_name, f"{file_path}/{file_name}")
+
+    return list(await asyncio.gather(*(stat(file_name, file_path) for file_name, file_path in files)))
+
+
+async def copy_file_from_minio(file_name_from: str, file_path_from: str, file_name_to: str, file_path_to: str,
+                               bucket_name: str = BUCKET_PHOTO_NAME):
+    await STORAGE_BACKEND.copy_object(bucket_name, f"{file_path_to}/{file_name_to}",
+                                      f"{file_path_from}/{file_name_from}")
 
 
-def delete_file_from_minio(file_name: str, file_path: str, bucket_name: str):
+async def delete_file_from_minio(file_name: str, file_path: str, bucket_name: str):
     filename = f"{file_path}/{file_name}"
-    MINIO_CLIENT.remove_object(bucket_name, filename)
+    await STORAGE_BACKEND.remove_object(bucket_name, filename)
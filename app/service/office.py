@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from app.service.redis import publish_process_stats, collect_process_stats
+from app.settings import settings
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+logger = logging.getLogger(__name__)
+
+OFFICE_STATS_KEY_PREFIX = 'office:pool:'
+
+
+class OfficeConversionError(Exception):
+    pass
+
+
+class OfficeInstance(ABC):
+    """
+    One LibreOffice slot of the pool. Each slot owns its user profile, so slots convert in parallel; profiles are
+    also per process, as every app and worker process runs its own pool.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+
+    @property
+    def profile_dir(self) -> Path:
+        return Path(settings.OFFICE_PROFILE_DIR, f'{os.getpid()}-slot-{self.index}')
+
+    @property
+    def profile_url(self) -> str:
+        return self.profile_dir.resolve().as_uri()
+
+    @abstractmethod
+    async def start(self):
+        ...
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+    @abstractmethod
+    async def healthy(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def convert(self, source: Path, target: Path):
+        """
+        Convert ``source`` into the PDF ``target``, raising ``OfficeConversionError`` on failure or timeout.
+        """
+
+
+class UnoOfficeInstance(OfficeInstance):
+    """
+    A resident ``soffice`` listening on a UNO socket; documents are loaded and exported without a new process.
+    """
+
+    def __init__(self, index: int):
+        super().__init__(index)
+        self.port = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._desktop = None
+        # UNO calls block, and a connection must stay on one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'office-{index}')
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver',
+                                                                          local_context)
+        context = resolver.resolve(f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext')
+        self._desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    async def start(self):
+        self.port = self._free_port()
+        self._process = await asyncio.create_subprocess_exec(
+            settings.OFFICE_BINARY, f'-env:UserInstallation={self.profile_url}', '--headless', '--invisible',
+            '--nologo', '--norestore', '--nodefault',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + settings.OFFICE_START_TIMEOUT
+        while True:
+            if self._process.returncode is not None:
+                raise OfficeConversionError(f'soffice slot {self.index} exited with {self._process.returncode}')
+            try:
+                await self._run(self._connect)
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    await self.stop()
+                    raise OfficeConversionError(f'soffice slot {self.index} did not accept connections')
+                await asyncio.sleep(0.25)
+
+    async def stop(self):
+        self._desktop = None
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    async def healthy(self) -> bool:
+        if self._desktop is None or self._process is None or self._process.returncode is not None:
+            return False
+        try:
+            await asyncio.wait_for(self._run(self._desktop.getCurrentComponent), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    def _convert(self, source: Path, target: Path):
+        hidden = PropertyValue()
+        hidden.Name, hidden.Value = 'Hidden', True
+        pdf_filter = PropertyValue()
+        pdf_filter.Name, pdf_filter.Value = 'FilterName', 'writer_pdf_Export'
+        document = self._desktop.loadComponentFromURL(uno.systemPathToFileUrl(str(source)), '_blank', 0,
+                                                      (hidden,))
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(str(target)), (pdf_filter,))
+        finally:
+            document.close(True)
+
+    async def convert(self, source: Path, target: Path):
+        try:
+            await asyncio.wait_for(self._run(self._convert, source, target),
+                                   timeout=settings.OFFICE_CONVERSION_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Killing the process unblocks the UNO call still running on the slot's thread
+            await self.stop()
+            raise OfficeConversionError(f'Conversion timed out on soffice slot {self.index}')
+        except Exception as e:
+            raise OfficeConversionError(str(e)) from e
+
+
+class CliOfficeInstance(OfficeInstance):
+    """
+    Fallback when the UNO bindings are not importable: one ``soffice --convert-to`` per document, reusing the
+    slot's already initialised profile so it skips first-start setup and can run next to the other slots.
+    """
+
+    async def _soffice(self, *args: str, timeout: float) -> int:
+        process = await asyncio.create_subprocess_exec(
+            settings.OFFICE_BINARY, f'-env:UserInstallation={self.profile_url}', '--headless', '--norestore',
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            return await asyncio.wait_for(process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise OfficeConversionError(f'soffice slot {self.index} timed out')
+
+    async def start(self):
+        await self._soffice('--terminate_after_init', timeout=settings.OFFICE_START_TIMEOUT)
+
+    async def stop(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    async def healthy(self) -> bool:
+        return self.profile_dir.is_dir()
+
+    async def convert(self, source: Path, target: Path):
+        await self._soffice('--convert-to', 'pdf', '--outdir', str(target.parent), str(source),
+                            timeout=settings.OFFICE_CONVERSION_TIMEOUT)
+        converted = target.parent / f'{source.stem}.pdf'
+        if not converted.is_file():
+            raise OfficeConversionError(f'soffice slot {self.index} produced no PDF')
+        if converted != target:
+            converted.rename(target)
+
+
+class OfficePool:
+    """
+    Pool of warm LibreOffice instances. Conversions wait for a free slot; a slot that fails its health check or
+    a conversion is restarted before it is handed out again.
+    """
+
+    def __init__(self, size: int):
+        instance_class = UnoOfficeInstance if uno is not None else CliOfficeInstance
+        self._instances: List[OfficeInstance] = [instance_class(index) for index in range(size)]
+        self._idle: asyncio.Queue[OfficeInstance] = asyncio.Queue()
+        self._broken: set[int] = set()
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self.queue_depth = 0
+        self.conversions = 0
+        self.restarts = 0
+
+    async def start(self):
+        async with self._start_lock:
+            if self._started:
+                return
+            if uno is None:
+                logger.warning('UNO bindings are not importable; soffice slots start one process per conversion')
+            results = await asyncio.gather(*(instance.start() for instance in self._instances),
+                                           return_exceptions=True)
+            for instance, result in zip(self._instances, results):
+                if isinstance(result, Exception):
+                    logger.warning('Could not start soffice slot %d: %s', instance.index, result)
+                    self._broken.add(instance.index)
+                self._idle.put_nowait(instance)
+            self._started = True
+            logger.info('Office pool started with %d %s slots', len(self._instances),
+                        type(self._instances[0]).__name__)
+
+    async def stop(self):
+        await asyncio.gather(*(instance.stop() for instance in self._instances), return_exceptions=True)
+        self._started = False
+        self._idle = asyncio.Queue()
+
+    async def _restart(self, instance: OfficeInstance):
+        self.restarts += 1
+        logger.warning('Restarting soffice slot %d', instance.index)
+        await instance.stop()
+        try:
+            await instance.start()
+            self._broken.discard(instance.index)
+        except Exception:
+            self._broken.add(instance.index)
+            raise
+
+    async def publish_stats(self):
+        await publish_process_stats(OFFICE_STATS_KEY_PREFIX, self.stats())
+
+    async def _acquire(self) -> OfficeInstance:
+        self.queue_depth += 1
+        await self.publish_stats()
+        started = time.perf_counter()
+        try:
+            instance = await self._idle.get()
+        finally:
+            self.queue_depth -= 1
+        waited = time.perf_counter() - started
+        if waited > 1:
+            logger.info('Waited %.3fs for soffice slot %d, %d still queued', waited, instance.index,
+                        self.queue_depth)
+        try:
+            if instance.index in self._broken or not await instance.healthy():
+                await self._restart(instance)
+        except Exception:
+            self._idle.put_nowait(instance)
+            raise OfficeConversionError(f'soffice slot {instance.index} is unavailable')
+        return instance
+
+    async def convert(self, document_bytes: bytes, file_extension: str) -> bytes:
+        await self.start()
+        instance = await self._acquire()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                source = Path(tmpdir, f'document.{file_extension}')
+                source.write_bytes(document_bytes)
+                target = Path(tmpdir, 'document.pdf')
+                started = time.perf_counter()
+                try:
+                    await instance.convert(source, target)
+                except OfficeConversionError:
+                    # A document LibreOffice cannot read leaves the slot usable; a crash or hang does not
+                    if not await instance.healthy():
+                        self._broken.add(instance.index)
+                    raise
+                self.conversions += 1
+                logger.info('Converted %s (%d bytes) on soffice slot %d in %.3fs', source.name,
+                            len(document_bytes), instance.index, time.perf_counter() - started)
+                return target.read_bytes()
+        finally:
+            self._idle.put_nowait(instance)
+            await self.publish_stats()
+
+    def stats(self) -> dict:
+        return {
+            'mode': 'uno' if uno is not None else 'cli',
+            'size': len(self._instances),
+            'idle': self._idle.qsize(),
+            'unhealthy': len(self._broken),
+            'queue_depth': self.queue_depth,
+            'conversions': self.conversions,
+            'restarts': self.restarts,
+        }
+
+
+OFFICE_POOL = OfficePool(settings.OFFICE_POOL_SIZE)
+
+
+async def collect_office_stats() -> List[dict]:
+    return await collect_process_stats(OFFICE_STATS_KEY_PREFIX)
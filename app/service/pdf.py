@@ -1,79 +1,262 @@
+import logging
 import os
-import subprocess
-import tempfile
+from contextlib import ExitStack
 from http import HTTPStatus
 from io import BytesIO
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 
 import img2pdf
 import pymupdf
-from PIL import Image
+from PIL import Image, ImageOps
 from fastapi import HTTPException
-from pypdf import PdfWriter, PdfReader
+from pypdf import PdfReader, PageObject
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, \
+    NullObject, NumberObject, PdfObject, StreamObject
+
+from app.service.office import OFFICE_POOL, OfficeConversionError
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+A4_PORTRAIT = (img2pdf.mm_to_pt(210), img2pdf.mm_to_pt(297))
+A4_LANDSCAPE = (img2pdf.mm_to_pt(297), img2pdf.mm_to_pt(210))
+
+# Pillow format and content type of each supported IMAGE_COVER_FORMAT
+COVER_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+EXIF_ORIENTATION = 0x0112
+
+
+def cover_content_type() -> str:
+    return COVER_FORMATS[settings.IMAGE_COVER_FORMAT][1]
+
+
+def _flatten_to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])  # usa o alpha como máscara
+        return background
+    return img.convert("RGB")  # garante que é RGB
+
+
+def open_normalized_image(img_byte: bytes, max_size: Tuple[int, int]) -> Tuple[Image.Image, bool]:
+    """
+    Decode an image upright and no larger than ``max_size`` (width, height, after EXIF rotation). JPEGs are
+    decoded straight at a reduced scale when possible. Also returns whether the pixels had to change.
+    """
+    img = Image.open(BytesIO(img_byte))
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    # Orientations 5-8 swap the axes
+    raw_max_size = max_size[::-1] if orientation in (5, 6, 7, 8) else max_size
+    if img.width <= raw_max_size[0] and img.height <= raw_max_size[1] and orientation == 1:
+        return img, False
+
+    img.draft('RGB', raw_max_size)
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img, True
+
+
+def _encode_cover(img: Image.Image) -> bytes:
+    image_format, _ = COVER_FORMATS[settings.IMAGE_COVER_FORMAT]
+    img.thumbnail((settings.IMAGE_COVER_MAX_SIZE, settings.IMAGE_COVER_MAX_SIZE), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG':
+        img = _flatten_to_rgb(img)
+    output = BytesIO()
+    img.save(output, format=image_format, quality=settings.IMAGE_COVER_QUALITY)
+    return output.getvalue()
 
 
 def extract_cover_from_pdf(pdf_bytes):
     doc = pymupdf.open(stream=pdf_bytes)
     page = doc[0]
     pix = page.get_pixmap(matrix=pymupdf.Matrix(1, 1))
-    result = pix.tobytes()
+    result = Image.frombytes('RGBA' if pix.alpha else 'RGB', (pix.width, pix.height), pix.samples)
+
+    return _encode_cover(result)
+
 
-    return result
+def convert_image_to_cover(img_byte: bytes) -> bytes:
+    max_size = settings.IMAGE_COVER_MAX_SIZE
+    img, _ = open_normalized_image(img_byte, (max_size, max_size))
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA')
+    return _encode_cover(img)
 
 
-def convert_image_to_pdf(img_byte: bytes):
+def convert_image_to_pdf(img_byte: bytes) -> bytes:
+    """
+    Place an image upright on an A4 page matching its orientation, at no more than IMAGE_MAX_DPI. RGB JPEGs
+    that need neither rotation nor downscaling are embedded as they are; anything else is decoded once (at a
+    reduced JPEG scale when possible) and encoded once as JPEG at IMAGE_JPEG_QUALITY.
+    """
     img = Image.open(BytesIO(img_byte))
-    if img.mode in ("RGBA", "LA"):
-        background = Image.new("RGB", img.size, (255, 255, 255))
-        background.paste(img, mask=img.split()[-1])  # usa o alpha como máscara
-        img = background
-    else:
-        img = img.convert("RGB")  # garante que é RGB
-    writer = PdfWriter()
-    output = BytesIO()
-    img.save(output, format="JPEG")
-    img_byte = output.getvalue()
-    with Image.open(BytesIO(img_byte)) as img:
-        width, height = img.size
-        if width > height:
-            layout_fun = img2pdf.get_layout_fun(
-                (img2pdf.mm_to_pt(297), img2pdf.mm_to_pt(210))
-            )
-        else:
-            layout_fun = img2pdf.get_layout_fun(
-                (img2pdf.mm_to_pt(210), img2pdf.mm_to_pt(297))
-            )
-
-        writer.append(BytesIO(img2pdf.convert(img_byte, layout_fun=layout_fun)))
-        output_buffer = BytesIO()
-        writer.write(output_buffer)
-        return output_buffer.getvalue()
-
-
-def convert_doc_to_pdf(pdf_bytes, file_extension):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        document_path = os.path.join(tmpdir, f'document.{file_extension}')
-        with open(document_path, 'wb') as f:
-            f.write(pdf_bytes)
-        args = ['soffice', '--headless', '--convert-to', 'pdf', '--outdir', tmpdir, document_path]
-        try:
-            subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
-            pdf_path = os.path.join(tmpdir, f'document.pdf')
-            return Path(pdf_path).read_bytes()
-        except Exception as e:
-            raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail='Could not convert file to pdf')
-
-
-def merge_pdfs(pdfs: List[bytes]) -> bytes:
-    pdf_writer = PdfWriter()
-    for pdf in pdfs:
-        if not pdf:
-            raise Exception('PDF is empty')
-        pdf_reader = PdfReader(BytesIO(pdf))
-        pdf_writer.append(pdf_reader)
-    out_buffer = BytesIO()
-    pdf_writer.write(out_buffer)
-    bytes_pdf = out_buffer.getvalue()
-    out_buffer.close()
-    return bytes_pdf
+    width, height = img.size
+    if img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+        width, height = height, width
+    page_size = A4_LANDSCAPE if width > height else A4_PORTRAIT
+    max_size = tuple(int(side / 72 * settings.IMAGE_MAX_DPI) for side in page_size)
+
+    img, changed = open_normalized_image(img_byte, max_size)
+    if changed or img.format != 'JPEG' or img.mode != 'RGB':
+        output = BytesIO()
+        _flatten_to_rgb(img).save(output, format="JPEG", quality=settings.IMAGE_JPEG_QUALITY)
+        img_byte = output.getvalue()
+
+    # Pixels are already upright, so img2pdf must not apply the EXIF orientation again
+    return img2pdf.convert(img_byte, layout_fun=img2pdf.get_layout_fun(page_size), rotation=img2pdf.Rotation.none)
+
+
+async def convert_doc_to_pdf(doc_bytes: bytes, file_extension: str) -> bytes:
+    try:
+        return await OFFICE_POOL.convert(doc_bytes, file_extension)
+    except OfficeConversionError as e:
+        logger.warning('Could not convert %s document: %s', file_extension, e)
+        raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail='Could not convert file to pdf')
+
+
+class _PdfStreamWriter:
+    """
+    Writes a PDF object by object as pages are copied into it. Only the new object numbers and offsets stay in
+    memory; parsed source objects are dropped from the readers' caches whenever their stream data passes
+    ``memory_budget`` bytes.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, output: BinaryIO, memory_budget: int):
+        self._output = output
+        self._memory_budget = memory_budget
+        self._cached_bytes = 0
+        self._readers: List[PdfReader] = []
+        self._numbers: Dict[Tuple[int, int, int], int] = {}
+        self._offsets: Dict[int, int] = {}
+        self._kids: List[int] = []
+        self._last_number = self.PAGES
+        output.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def _next_number(self) -> int:
+        self._last_number += 1
+        return self._last_number
+
+    def _reference(self, reader: PdfReader, reference: IndirectObject, pending: list) -> IndirectObject:
+        key = (id(reader), reference.idnum, reference.generation)
+        number = self._numbers.get(key)
+        if number is None:
+            number = self._numbers[key] = self._next_number()
+            pending.append((number, reference))
+        return IndirectObject(number, 0, None)
+
+    def _copy(self, reader: PdfReader, obj: PdfObject, pending: list) -> PdfObject:
+        if isinstance(obj, IndirectObject):
+            return self._reference(reader, obj, pending)
+        if isinstance(obj, DictionaryObject):
+            copy = DecodedStreamObject() if isinstance(obj, StreamObject) else DictionaryObject()
+            for key, value in dict.items(obj):
+                if key != '/Length':
+                    copy[key] = self._copy(reader, value, pending)
+            if isinstance(obj, StreamObject):
+                # Still encoded: /Filter and /DecodeParms were copied along
+                copy._data = obj._data
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(reader, value, pending) for value in list.__iter__(obj))
+        return obj
+
+    def _write(self, number: int, obj: PdfObject):
+        self._offsets[number] = self._output.tell()
+        self._output.write(f'{number} 0 obj\n'.encode())
+        obj.write_to_stream(self._output)
+        self._output.write(b'\nendobj\n')
+
+    def _release_cache(self, size: int):
+        self._cached_bytes += size
+        if self._cached_bytes > self._memory_budget:
+            for reader in self._readers:
+                reader.resolved_objects.clear()
+            self._cached_bytes = 0
+
+    def reserve_page(self, reader: PdfReader, page: PageObject) -> int:
+        """
+        Number a page before any page is copied, so links to pages further on already resolve to it.
+        """
+        if reader not in self._readers:
+            self._readers.append(reader)
+        number = self._next_number()
+        # A page copied twice takes link targets to its first copy
+        self._numbers.setdefault((id(reader), page.indirect_reference.idnum, page.indirect_reference.generation),
+                                 number)
+        return number
+
+    def add_page(self, reader: PdfReader, page: PageObject, number: int):
+        pending = []
+        copy = self._copy(reader, DictionaryObject({key: value for key, value in dict.items(page)
+                                                    if key != '/Parent'}), pending)
+        copy[NameObject('/Parent')] = IndirectObject(self.PAGES, 0, None)
+        self._write(number, copy)
+        self._kids.append(number)
+        while pending:
+            number, reference = pending.pop()
+            obj = reference.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get('/Type') in ('/Page', '/Pages', '/Catalog'):
+                # Links to pages outside the copied ranges, or back up the source page tree
+                self._write(number, NullObject())
+                continue
+            self._write(number, self._copy(reader, obj, pending))
+            if isinstance(obj, StreamObject):
+                self._release_cache(len(obj._data))
+
+    def close(self):
+        self._write(self.PAGES, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(IndirectObject(number, 0, None) for number in self._kids),
+            NameObject('/Count'): NumberObject(len(self._kids)),
+        }))
+        self._write(self.CATALOG, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.PAGES, 0, None),
+        }))
+        size = max(self._offsets) + 1
+        xref_offset = self._output.tell()
+        self._output.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+        for number in range(1, size):
+            self._output.write(f'{self._offsets[number]:010} 00000 n \n'.encode())
+        self._output.write(f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\n'
+                           f'startxref\n{xref_offset}\n%%EOF\n'.encode())
+
+
+def merge_pdf_ranges(parts: List[Tuple[Path, Optional[Tuple[int, int]]]],
+                     output: Union[Path, BinaryIO]) -> List[int]:
+    """
+    Merge page ranges of PDFs on disk into ``output``. Each part is a path and a (start, stop) page range, or None
+    for the whole file; a path may appear in many parts and is parsed once. Returns the page count of each part.
+
+    Pages are written out as they are copied, so memory stays around ``PDF_MERGE_MEMORY_BUDGET`` plus the page
+    trees instead of growing with the inputs. Outlines, forms and document metadata are not carried over.
+    """
+    with ExitStack() as stack:
+        if isinstance(output, Path):
+            output = stack.enter_context(output.open('wb'))
+        writer = _PdfStreamWriter(output, settings.PDF_MERGE_MEMORY_BUDGET)
+        readers: Dict[Path, PdfReader] = {}
+        pages = []
+        page_counts = []
+        for pdf_path, page_range in parts:
+            reader = readers.get(pdf_path)
+            if reader is None:
+                if not os.path.getsize(pdf_path):
+                    raise Exception('PDF is empty')
+                # A file object, unlike a path, is read on demand instead of loaded whole
+                reader = readers[pdf_path] = PdfReader(stack.enter_context(open(pdf_path, 'rb')))
+            start, stop = page_range or (0, len(reader.pages))
+            pages += ((reader, index, writer.reserve_page(reader, reader.pages[index])) for index in range(start, stop))
+            page_counts.append(stop - start)
+        for reader, index, number in pages:
+            writer.add_page(reader, reader.pages[index], number)
+        writer.close()
+    return page_counts
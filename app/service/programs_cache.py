@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from pathlib import PurePath
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, and_, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProgramsUpload
+from app.service.minio import delete_file_from_minio, BUCKET_PROGRAMS_NAME, get_file_bytes_from_minio, \
+    upload_file_to_minio
+from app.service.redis import REDIS_CLIENT
+from app.service.storage import StorageError
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS_KEY = 'programs:unified-pdf:hits'
+CACHE_MISSES_KEY = 'programs:unified-pdf:misses'
+
+
+def unified_pdf_cache_key(id_psychologist: int, etags: Sequence[str]) -> str:
+    """
+    Content address of a unified PDF: the hash of the ordered ETags of its sources.
+    """
+    digest = hashlib.sha256(str(id_psychologist).encode())
+    for etag in etags:
+        digest.update(b'\n')
+        digest.update(etag.encode())
+    return digest.hexdigest()
+
+
+def _generated_of(id_psychologist: int):
+    return and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.generated == True)
+
+
+async def find_cached_pdf(session: AsyncSession, id_psychologist: int, cache_key: str) -> Optional[ProgramsUpload]:
+    """
+    The generated PDF stored under ``cache_key``, marking it as recently used.
+    """
+    db_program_generated = await session.scalar(
+        select(ProgramsUpload).where(and_(_generated_of(id_psychologist), ProgramsUpload.asset_uuid == cache_key))
+    )
+    if db_program_generated:
+        await session.execute(
+            update(ProgramsUpload).where(ProgramsUpload.id == db_program_generated.id)
+            .values(updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    return db_program_generated
+
+
+async def find_latest_cached_pdf(session: AsyncSession, id_psychologist: int) -> Optional[ProgramsUpload]:
+    return await session.scalar(
+        select(ProgramsUpload).where(_generated_of(id_psychologist))
+        .order_by(ProgramsUpload.updated_at.desc()).limit(1)
+    )
+
+
+def manifest_name(pdf_name: str) -> str:
+    return str(PurePath(pdf_name).with_suffix('.json'))
+
+
+def build_manifest(programs: Sequence[Tuple[str, str, str]], page_counts: Sequence[int]) -> List[dict]:
+    """
+    Page range of every (name, path, etag) source inside the merged PDF.
+    """
+    manifest, start = [], 0
+    for (name, _, etag), count in zip(programs, page_counts):
+        manifest.append({'asset_uuid': PurePath(name).stem, 'etag': etag, 'start': start, 'count': count})
+        start += count
+    return manifest
+
+
+async def load_manifest(db_program_generated: ProgramsUpload) -> Optional[List[dict]]:
+    """
+    Page-range manifest stored next to a merged PDF; None for reports merged before manifests existed.
+    """
+    try:
+        manifest = await get_file_bytes_from_minio(manifest_name(db_program_generated.name),
+                                                   db_program_generated.path, BUCKET_PROGRAMS_NAME)
+    except StorageError:
+        return None
+    return json.loads(manifest)
+
+
+async def save_manifest(db_program_generated: ProgramsUpload, manifest: List[dict]):
+    await upload_file_to_minio(json.dumps(manifest).encode(), 'application/json',
+                               manifest_name(db_program_generated.name), db_program_generated.path,
+                               BUCKET_PROGRAMS_NAME)
+
+
+async def evict_cached_pdfs(session: AsyncSession, id_psychologist: int, keep: str) -> int:
+    """
+    Drop the psychologist's generated PDFs beyond the most recently used ``PROGRAMS_CACHE_MAX_ENTRIES`` or older
+    than ``PROGRAMS_CACHE_TTL_HOURS``, never the one stored under ``keep``.
+
+    The row deletions are committed before the objects are removed, so a rollback can never leave cache rows
+    pointing at deleted PDFs.
+    """
+    expired = ProgramsUpload.updated_at < func.now() - timedelta(hours=settings.PROGRAMS_CACHE_TTL_HOURS)
+    rows = (await session.execute(
+        select(ProgramsUpload.id, expired.label('expired')).where(
+            and_(_generated_of(id_psychologist), ProgramsUpload.asset_uuid != keep))
+        .order_by(ProgramsUpload.updated_at.desc())
+    )).all()
+    ids = [id_program for position, (id_program, is_expired) in enumerate(rows, start=1)
+           if is_expired or position >= settings.PROGRAMS_CACHE_MAX_ENTRIES]
+    if not ids:
+        return 0
+
+    # Only the rows this transaction actually deleted: a concurrent eviction may have taken some already
+    evicted = (await session.execute(
+        delete(ProgramsUpload).where(ProgramsUpload.id.in_(ids))
+        .returning(ProgramsUpload.name, ProgramsUpload.path)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await session.commit()
+    for name, path in evicted:
+        await delete_file_from_minio(name, path, BUCKET_PROGRAMS_NAME)
+        await delete_file_from_minio(manifest_name(name), path, BUCKET_PROGRAMS_NAME)
+    if evicted:
+        logger.info('Evicted %d unified PDFs of psychologist %d', len(evicted), id_psychologist)
+    return len(evicted)
+
+
+async def record_cache_hit():
+    await REDIS_CLIENT.incr(CACHE_HITS_KEY)
+
+
+async def record_cache_miss():
+    await REDIS_CLIENT.incr(CACHE_MISSES_KEY)
+
+
+async def get_cache_stats() -> dict:
+    hits, misses = await REDIS_CLIENT.mget(CACHE_HITS_KEY, CACHE_MISSES_KEY)
+    hits, misses = int(hits or 0), int(misses or 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
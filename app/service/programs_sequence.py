@@ -0,0 +1,83 @@
+from typing import Dict, Optional
+
+from sqlalchemy import select, update, and_, func, values, column, String, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProgramsUpload
+
+# Programs are ordered by sparse ranks, so placing one asset only writes that asset's rows.
+SEQUENCE_GAP = 1024
+
+
+def _programs_of(id_psychologist: int):
+    return and_(ProgramsUpload.id_psychologist == id_psychologist, ProgramsUpload.generated == False)
+
+
+async def next_sequence(session: AsyncSession, id_psychologist: int) -> int:
+    """
+    Sequence for an asset appended at the end of the psychologist's programs.
+    """
+    max_sequence = await session.scalar(
+        select(func.max(ProgramsUpload.sequence)).where(_programs_of(id_psychologist))
+    )
+    return SEQUENCE_GAP if max_sequence is None else max_sequence + SEQUENCE_GAP
+
+
+async def sequence_after(session: AsyncSession, id_psychologist: int, asset_uuid: Optional[str]) -> int:
+    """
+    Sequence for an asset placed right after ``asset_uuid`` (or first, when None). Rebalances the psychologist's
+    programs when there is no gap left at that position.
+    """
+    for _ in range(2):
+        lower = 0
+        if asset_uuid is not None:
+            lower = await session.scalar(
+                select(func.min(ProgramsUpload.sequence)).where(
+                    and_(_programs_of(id_psychologist), ProgramsUpload.asset_uuid == asset_uuid))
+            )
+        upper = await session.scalar(
+            select(func.min(ProgramsUpload.sequence)).where(
+                and_(_programs_of(id_psychologist), ProgramsUpload.sequence > lower))
+        )
+        if upper is None:
+            return lower + SEQUENCE_GAP
+        if upper - lower > 1:
+            return (lower + upper) // 2
+        await rebalance_sequences(session, id_psychologist)
+    raise RuntimeError(f'Could not find a free sequence for psychologist {id_psychologist}')
+
+
+async def rebalance_sequences(session: AsyncSession, id_psychologist: int):
+    """
+    Spread the psychologist's programs back to ``SEQUENCE_GAP`` intervals, keeping their order, in one statement.
+    """
+    ranks = select(
+        ProgramsUpload.asset_uuid,
+        func.dense_rank().over(order_by=(ProgramsUpload.sequence, ProgramsUpload.asset_uuid)).label('rank')
+    ).where(_programs_of(id_psychologist)).subquery('ranks')
+    await session.execute(
+        update(ProgramsUpload)
+        .where(and_(_programs_of(id_psychologist), ProgramsUpload.asset_uuid == ranks.c.asset_uuid))
+        .values(sequence=ranks.c.rank * SEQUENCE_GAP)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reorder_sequences(session: AsyncSession, id_psychologist: int, sequences: Dict[str, int]):
+    """
+    Set the sequence of many assets at once with ``UPDATE ... FROM (VALUES ...)``, keyed by asset_uuid.
+    """
+    if not sequences:
+        return
+    new_sequences = values(
+        column('asset_uuid', String),
+        column('sequence', Integer),
+        name='new_sequences'
+    ).data(list(sequences.items()))
+    await session.execute(
+        update(ProgramsUpload)
+        .where(and_(ProgramsUpload.id_psychologist == id_psychologist,
+                    ProgramsUpload.asset_uuid == new_sequences.c.asset_uuid))
+        .values(sequence=new_sequences.c.sequence)
+        .execution_options(synchronize_session=False)
+    )
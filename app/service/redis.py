@@ -0,0 +1,34 @@
+import json
+import logging
+import os
+import socket
+from typing import List
+
+from redis import RedisError
+from redis.asyncio import Redis
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Shares the broker's Redis; the client keeps its own connection pool.
+REDIS_CLIENT = Redis.from_url(settings.BROKER_URL, decode_responses=True)
+
+PROCESS_STATS_TTL = 300
+
+
+async def publish_process_stats(prefix: str, stats: dict):
+    """
+    Share a pool's stats for this process under ``prefix``, so the API can report the pools of every worker.
+    """
+    try:
+        await REDIS_CLIENT.set(f'{prefix}{socket.gethostname()}:{os.getpid()}', json.dumps(stats),
+                               ex=PROCESS_STATS_TTL)
+    except RedisError as e:
+        logger.warning('Could not publish %s stats: %s', prefix, e)
+
+
+async def collect_process_stats(prefix: str) -> List[dict]:
+    keys = [key async for key in REDIS_CLIENT.scan_iter(f'{prefix}*')]
+    values = await REDIS_CLIENT.mget(keys) if keys else []
+    return [{'instance': key.removeprefix(prefix), **json.loads(value)} for key, value in zip(keys, values) if value]
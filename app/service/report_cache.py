@@ -0,0 +1,114 @@
+import hashlib
+import logging
+from typing import Optional
+
+from redis import RedisError
+from sqlalchemy import select, func, literal_column, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient, Psychologist, Idadi, IdadiValues, PatientRecord, Pti, PtiStimulusAreas, \
+    PtiSpecificObjectivesTopics, PtiSpecificObjectivesSubTopics
+from app.service.minio import BUCKET_IDADI_NAME, get_file_url_from_minio
+from app.service.redis import REDIS_CLIENT
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_KEY_PREFIX = 'idadi:report:'
+# Deletes the in-flight marker only if it still names the finishing task
+RELEASE_IN_FLIGHT_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _version_sources(id_patient: int):
+    """
+    One ``(count, max(updated_at))`` query per table the report reads. The count catches deletes, which leave no
+    newer stamp behind.
+    """
+    pti = select(Pti.id).where(Pti.id_patient == id_patient)
+    areas = select(PtiStimulusAreas.id).where(PtiStimulusAreas.id_pti.in_(pti))
+    topics = select(PtiSpecificObjectivesTopics.id).where(PtiSpecificObjectivesTopics.id_pti_stimulus_area.in_(areas))
+    return [
+        (Patient, Patient.id == id_patient),
+        (Psychologist, Psychologist.id == select(Patient.id_psychologist).where(Patient.id == id_patient)
+         .scalar_subquery()),
+        (Idadi, Idadi.id_patient == id_patient),
+        (IdadiValues, IdadiValues.id_idadi.in_(select(Idadi.id).where(Idadi.id_patient == id_patient))),
+        (PatientRecord, PatientRecord.id_patient == id_patient),
+        (Pti, Pti.id_patient == id_patient),
+        (PtiStimulusAreas, PtiStimulusAreas.id_pti.in_(pti)),
+        (PtiSpecificObjectivesTopics, PtiSpecificObjectivesTopics.id_pti_stimulus_area.in_(areas)),
+        (PtiSpecificObjectivesSubTopics, PtiSpecificObjectivesSubTopics.id_pti_specific_objectives_topics.in_(topics)),
+    ]
+
+
+async def report_cache_key(session: AsyncSession, report_name: str, id_patient: int) -> str:
+    """
+    Content version of a patient's report: any insert, update or delete on the rows it is rendered from changes it.
+    """
+    rows = await session.execute(union_all(*(
+        select(literal_column(str(index)).label('source'), func.count(), func.max(model.updated_at)).where(condition)
+        for index, (model, condition) in enumerate(_version_sources(id_patient))
+    )))
+    digest = hashlib.sha256(f'{report_name}:{id_patient}'.encode())
+    for source, count, updated_at in sorted(rows.all(), key=lambda row: row.source):
+        digest.update(f'\n{source}:{count}:{updated_at.isoformat() if updated_at else ""}'.encode())
+    return f'{REPORT_CACHE_KEY_PREFIX}{id_patient}:{digest.hexdigest()}'
+
+
+async def find_cached_report(cache_key: str) -> Optional[str]:
+    """
+    Presigned URL of the report rendered for ``cache_key``, if it is still stored.
+    """
+    try:
+        object_name = await REDIS_CLIENT.get(cache_key)
+    except RedisError as e:
+        logger.warning('Could not read the report cache: %s', e)
+        return None
+    if object_name is None:
+        return None
+    logger.info('Report cache hit for %s', cache_key)
+    return get_file_url_from_minio(object_name, 'pdf', BUCKET_IDADI_NAME)
+
+
+async def store_cached_report(cache_key: str, object_name: str):
+    # Expire before the bucket's lifecycle rule removes the object from pdf/
+    try:
+        await REDIS_CLIENT.set(cache_key, object_name, ex=settings.REPORT_CACHE_TTL_HOURS * 3600)
+    except RedisError as e:
+        logger.warning('Could not store %s in the report cache: %s', cache_key, e)
+
+
+def _in_flight_key(cache_key: str) -> str:
+    return f'{cache_key}:in-flight'
+
+
+async def claim_report_render(cache_key: str, task_id: str) -> Optional[str]:
+    """
+    Register ``task_id`` as the render of ``cache_key``. Returns the task already rendering it, if any, so
+    concurrent requests attach to it instead of rendering the same report again.
+    """
+    key = _in_flight_key(cache_key)
+    try:
+        if await REDIS_CLIENT.set(key, task_id, nx=True, ex=settings.REPORT_IN_FLIGHT_TTL):
+            return None
+        in_flight_task_id = await REDIS_CLIENT.get(key)
+    except RedisError as e:
+        logger.warning('Could not check in-flight renders of %s: %s', cache_key, e)
+        return None
+    # The render may have finished between both calls; claiming again is then safe
+    if in_flight_task_id is None:
+        return await claim_report_render(cache_key, task_id)
+    logger.info('Attaching to in-flight report render %s for %s', in_flight_task_id, cache_key)
+    return in_flight_task_id
+
+
+async def release_report_render(cache_key: str, task_id: str):
+    try:
+        await REDIS_CLIENT.eval(RELEASE_IN_FLIGHT_SCRIPT, 1, _in_flight_key(cache_key), task_id)
+    except RedisError as e:
+        logger.warning('Could not release the in-flight render of %s: %s', cache_key, e)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import signal
+import time
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set, TypeVar
+
+from app.service.redis import publish_process_stats, collect_process_stats
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+REPORT_STATS_KEY_PREFIX = 'report:executor:'
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+
+class ReportExecutorError(Exception):
+    pass
+
+
+class ReportQueueFull(ReportExecutorError):
+    pass
+
+
+class ReportTimeout(ReportExecutorError):
+    pass
+
+
+class ReportExecutor:
+    """
+    Bounds the reports a worker process renders at once. Jobs past ``size`` wait in a queue of at most
+    ``queue_limit``; each job gets ``timeout`` seconds once it starts, and the time spent queued and rendering is
+    recorded separately.
+    """
+
+    def __init__(self, size: int, queue_limit: int, timeout: float):
+        self.size = size
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(size)
+        self._processes: Set[asyncio.subprocess.Process] = set()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+
+    async def run(self, job: Callable[[], Awaitable[T]]) -> T:
+        if self.waiting >= self.queue_limit:
+            self.rejected += 1
+            await self.publish_stats()
+            raise ReportQueueFull(f'{self.waiting} reports already queued')
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - queued
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.running += 1
+        await self.publish_stats()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(job(), timeout=self.timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ReportTimeout(f'Report did not finish within {self.timeout}s')
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            rendered = time.perf_counter() - started
+            self.render_seconds += rendered
+            self.max_render_seconds = max(self.max_render_seconds, rendered)
+            self.running -= 1
+            self._semaphore.release()
+            logger.info('Report waited %.3fs in queue and rendered in %.3fs', waited, rendered)
+            await self.publish_stats()
+
+    async def run_process(self, args: List[str], output: Optional[Path] = None,
+                          consume: Optional[Callable[[AsyncIterator[bytes]], Awaitable]] = None) -> bytes:
+        """
+        Run a report JVM inside the pool and return its stdout. The JVM gets its own process group, so a
+        timeout or cancellation kills it together with anything it forked and reaps it before returning.
+
+        With ``output``, the file the JVM writes is a FIFO at that path and ``consume`` gets its bytes while the
+        JVM is still rendering; the chunks raise if the JVM fails, so a partial report is never consumed whole, and
+        a JVM that writes nothing fails without ``consume`` being called.
+        """
+        async def job() -> bytes:
+            transport = keepalive = None
+
+            def close_keepalive():
+                nonlocal keepalive
+                if keepalive is not None:
+                    os.close(keepalive)
+                    keepalive = None
+
+            try:
+                if output is not None:
+                    os.mkfifo(output)
+                    reader = asyncio.StreamReader()
+                    transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+                        lambda: asyncio.StreamReaderProtocol(reader),
+                        os.fdopen(os.open(output, os.O_RDONLY | os.O_NONBLOCK), 'rb', buffering=0),
+                    )
+                    # Our own write end keeps the reader from hitting EOF before the JVM opens the FIFO
+                    keepalive = os.open(output, os.O_WRONLY | os.O_NONBLOCK)
+
+                proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE, start_new_session=True)
+                self._processes.add(proc)
+
+                async def communicate():
+                    try:
+                        return await proc.communicate()
+                    finally:
+                        close_keepalive()
+
+                async def stream():
+                    streamed = 0
+                    # Nothing is consumed until the JVM has written something: one that exits cleanly without
+                    # ever opening the FIFO must not leave an empty report behind
+                    first = await reader.read(OUTPUT_CHUNK_SIZE)
+                    if not first:
+                        await proc.wait()
+                        if not proc.returncode:
+                            raise ReportExecutorError(f'Report JVM wrote nothing to {output.name}')
+                        return
+
+                    async def chunks() -> AsyncIterator[bytes]:
+                        nonlocal streamed
+                        chunk = first
+                        while chunk:
+                            streamed += len(chunk)
+                            yield chunk
+                            chunk = await reader.read(OUTPUT_CHUNK_SIZE)
+                        await proc.wait()
+                        if proc.returncode:
+                            raise ReportExecutorError(f'Report JVM exited with {proc.returncode}')
+
+                    await consume(chunks())
+                    logger.info('Streamed %d bytes of %s', streamed, output.name)
+
+                tasks = [asyncio.ensure_future(communicate())]
+                if output is not None:
+                    tasks.append(asyncio.ensure_future(stream()))
+                try:
+                    (stdout, stderr), *_ = await asyncio.gather(*tasks)
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    await self._kill(proc)
+                    raise
+                finally:
+                    self._processes.discard(proc)
+                if proc.returncode:
+                    raise ReportExecutorError(f'Report JVM exited with {proc.returncode}: '
+                                              f'{stderr.decode(errors="replace")[-2000:]}')
+                return stdout
+            finally:
+                if transport is not None:
+                    transport.close()
+                close_keepalive()
+                if output is not None:
+                    output.unlink(missing_ok=True)
+
+        return await self.run(job)
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process):
+        if proc.returncode is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            logger.warning('Killed report JVM %d', proc.pid)
+
+    async def stop(self):
+        await asyncio.gather(*(self._kill(proc) for proc in list(self._processes)), return_exceptions=True)
+
+    async def publish_stats(self):
+        await publish_process_stats(REPORT_STATS_KEY_PREFIX, self.stats())
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed + self.timeouts
+        return {
+            'size': self.size,
+            'queue_limit': self.queue_limit,
+            'waiting': self.waiting,
+            'running': self.running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'avg_wait_seconds': round(self.wait_seconds / finished, 3) if finished else 0,
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+            'avg_render_seconds': round(self.render_seconds / finished, 3) if finished else 0,
+            'max_render_seconds': round(self.max_render_seconds, 3),
+        }
+
+
+REPORT_EXECUTOR = ReportExecutor(settings.REPORT_WORKERS or os.cpu_count(), settings.REPORT_QUEUE_LIMIT,
+                                 settings.REPORT_RENDER_TIMEOUT)
+
+
+async def collect_report_stats() -> List[dict]:
+    return await collect_process_stats(REPORT_STATS_KEY_PREFIX)
@@ -0,0 +1,187 @@
+import hashlib
+import hmac
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Union
+from urllib.parse import quote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import httpx
+
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+S3_XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class S3ResponseError(Exception):
+    def __init__(self, status_code: int, code: Optional[str], message: str):
+        super().__init__(f'{status_code} {code}: {message}')
+        self.status_code = status_code
+        self.code = code
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+class AsyncS3Client:
+    """
+    Minimal S3 client on top of a pooled ``httpx.AsyncClient``, signing every request with AWS SigV4.
+
+    Only the path-style calls the app needs are implemented, so it works against MinIO as well as S3.
+    """
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, region: str = 'us-east-1',
+                 secure: bool = False, max_connections: int = 100, timeout: float = 60):
+        self._host = endpoint
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+        self._client = httpx.AsyncClient(
+            base_url=f"{'https' if secure else 'http'}://{endpoint}",
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=10),
+        )
+
+    def _sign(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+              payload_hash: str) -> Dict[str, str]:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+
+        headers = {k.lower(): str(v).strip() for k, v in headers.items()}
+        headers.update({'host': self._host, 'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash})
+        signed_headers = ';'.join(sorted(headers))
+        canonical_headers = ''.join(f'{k}:{headers[k]}\n' for k in sorted(headers))
+        canonical_query = '&'.join(
+            f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in sorted(query.items())
+        )
+        canonical_request = '\n'.join([method, quote(path, safe='/~'), canonical_query, canonical_headers,
+                                       signed_headers, payload_hash])
+
+        scope = f'{date_stamp}/{self._region}/s3/aws4_request'
+        string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope,
+                                    hashlib.sha256(canonical_request.encode()).hexdigest()])
+        key = _hmac(f'AWS4{self._secret_key}'.encode(), date_stamp)
+        for part in (self._region, 's3', 'aws4_request'):
+            key = _hmac(key, part)
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers['authorization'] = (f'AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, '
+                                    f'SignedHeaders={signed_headers}, Signature={signature}')
+        del headers['host']
+        return headers
+
+    def _build_request(self, method: str, bucket_name: str, object_name: str = '',
+                       query: Optional[Dict[str, str]] = None, headers: Optional[Dict[str, str]] = None,
+                       content: Union[bytes, AsyncIterable[bytes], None] = None) -> httpx.Request:
+        path = f'/{bucket_name}/{object_name}' if object_name else f'/{bucket_name}'
+        query = query or {}
+        if content is None:
+            payload_hash = EMPTY_SHA256
+        elif isinstance(content, bytes):
+            payload_hash = hashlib.sha256(content).hexdigest()
+        else:
+            payload_hash = UNSIGNED_PAYLOAD
+        signed_headers = self._sign(method, path, query, headers or {}, payload_hash)
+        return self._client.build_request(method, quote(path, safe='/~'), params=query, headers=signed_headers,
+                                          content=content)
+
+    @staticmethod
+    async def _raise_for_status(response: httpx.Response):
+        if response.is_success:
+            return
+        body = await response.aread()
+        code, message = None, body.decode(errors='replace')
+        try:
+            root = ElementTree.fromstring(body)
+            code = root.findtext('Code')
+            message = root.findtext('Message') or message
+        except ElementTree.ParseError:
+            pass
+        raise S3ResponseError(response.status_code, code, message)
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        response = await self._client.send(request)
+        await self._raise_for_status(response)
+        return response
+
+    async def put_object(self, bucket_name: str, object_name: str, data: Union[bytes, AsyncIterable[bytes]],
+                         length: Optional[int] = None, content_type: str = 'application/octet-stream') -> str:
+        """
+        Upload an object from bytes, or stream it from an async iterable when ``length`` is known.
+        """
+        headers = {'content-type': content_type}
+        if not isinstance(data, bytes):
+            if length is None:
+                raise ValueError('length is required to stream an object body')
+            headers['content-length'] = str(length)
+        response = await self._send(self._build_request('PUT', bucket_name, object_name, headers=headers,
+                                                        content=data))
+        return response.headers.get('etag', '').strip('"')
+
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        response = await self._send(self._build_request('GET', bucket_name, object_name))
+        return response.content
+
+    async def stat_object(self, bucket_name: str, object_name: str) -> str:
+        """
+        ETag of an object, read with a HEAD request.
+        """
+        response = await self._send(self._build_request('HEAD', bucket_name, object_name))
+        return response.headers.get('etag', '').strip('"')
+
+    @asynccontextmanager
+    async def stream_object(self, bucket_name: str, object_name: str) -> AsyncIterator[httpx.Response]:
+        """
+        Open an object for streaming; iterate ``response.aiter_bytes()`` inside the context.
+        """
+        response = await self._client.send(self._build_request('GET', bucket_name, object_name), stream=True)
+        try:
+            await self._raise_for_status(response)
+            yield response
+        finally:
+            await response.aclose()
+
+    async def create_multipart_upload(self, bucket_name: str, object_name: str,
+                                      content_type: str = 'application/octet-stream') -> str:
+        response = await self._send(self._build_request('POST', bucket_name, object_name, query={'uploads': ''},
+                                                        headers={'content-type': content_type}))
+        return ElementTree.fromstring(response.content).findtext(f'{{{S3_XMLNS}}}UploadId')
+
+    async def upload_part(self, bucket_name: str, object_name: str, upload_id: str, part_number: int,
+                          data: bytes) -> str:
+        response = await self._send(self._build_request('PUT', bucket_name, object_name,
+                                                        query={'partNumber': str(part_number), 'uploadId': upload_id},
+                                                        content=data))
+        return response.headers['etag']
+
+    async def complete_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str,
+                                        etags: List[str]) -> str:
+        parts = ''.join(f'<Part><PartNumber>{number}</PartNumber><ETag>{escape(etag)}</ETag></Part>'
+                        for number, etag in enumerate(etags, start=1))
+        body = f'<CompleteMultipartUpload xmlns="{S3_XMLNS}">{parts}</CompleteMultipartUpload>'.encode()
+        response = await self._send(self._build_request('POST', bucket_name, object_name,
+                                                        query={'uploadId': upload_id},
+                                                        headers={'content-type': 'application/xml'}, content=body))
+        # S3 may answer 200 with an error document once the parts are assembled
+        root = ElementTree.fromstring(response.content)
+        if root.tag == 'Error':
+            raise S3ResponseError(response.status_code, root.findtext('Code'), root.findtext('Message') or '')
+        return (root.findtext(f'{{{S3_XMLNS}}}ETag') or '').strip('"')
+
+    async def abort_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str):
+        await self._send(self._build_request('DELETE', bucket_name, object_name, query={'uploadId': upload_id}))
+
+    async def copy_object(self, bucket_name: str, object_name: str, source_object_name: str,
+                          source_bucket_name: Optional[str] = None):
+        source = quote(f'/{source_bucket_name or bucket_name}/{source_object_name}', safe='/~')
+        await self._send(self._build_request('PUT', bucket_name, object_name,
+                                             headers={'x-amz-copy-source': source}))
+
+    async def remove_object(self, bucket_name: str, object_name: str):
+        await self._send(self._build_request('DELETE', bucket_name, object_name))
+
+    async def aclose(self):
+        await self._client.aclose()
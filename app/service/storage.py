@@ -0,0 +1,279 @@
+import asyncio
+import io
+import os
+import shutil
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, BinaryIO
+
+from minio import Minio, S3Error
+from minio.commonconfig import CopySource
+
+from app.service.s3 import AsyncS3Client, S3ResponseError
+
+PART_SIZE = 10 * 1024 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class _PipeReader:
+    """
+    Read end of the pipe that feeds ``Minio.put_object`` from a coroutine. Once the producer marks the upload as
+    failed, EOF raises instead, so Minio aborts the multipart upload rather than completing a truncated object.
+    """
+
+    def __init__(self, fd: int):
+        self._file = os.fdopen(fd, 'rb')
+        self.failed = False
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        if not data and self.failed:
+            raise StorageError('Upload stream failed')
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class StorageBackend(ABC):
+    """
+    Object operations used by ``app.service.minio``; every backend is awaitable.
+    """
+
+    @abstractmethod
+    async def put_object(self, bucket_name: str, object_name: str, data: bytes, content_type: str):
+        ...
+
+    @abstractmethod
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def stat_object(self, bucket_name: str, object_name: str) -> str:
+        """
+        ETag of an object, without reading its body.
+        """
+
+    @abstractmethod
+    async def download_to_file(self, bucket_name: str, object_name: str, file: BinaryIO):
+        """
+        Stream an object into ``file`` without holding it in memory.
+        """
+
+    @abstractmethod
+    async def upload_from_file(self, bucket_name: str, object_name: str, file: BinaryIO, content_type: str):
+        """
+        Upload ``file`` from its current position, in parts of at most ``PART_SIZE`` bytes.
+        """
+
+    @abstractmethod
+    async def upload_stream(self, bucket_name: str, object_name: str, chunks: AsyncIterable[bytes],
+                            content_type: str):
+        """
+        Upload the chunks as they are produced, holding at most ``PART_SIZE`` bytes. If ``chunks`` raises, nothing
+        is stored.
+        """
+
+    @abstractmethod
+    async def copy_object(self, bucket_name: str, object_name: str, source_object_name: str):
+        ...
+
+    @abstractmethod
+    async def remove_object(self, bucket_name: str, object_name: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class MinioThreadBackend(StorageBackend):
+    """
+    Runs the blocking ``Minio`` client on a dedicated thread pool.
+    """
+
+    def __init__(self, client: Minio, max_workers: int):
+        self._client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='minio')
+
+    async def _run(self, func, *args, **kwargs):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, lambda: func(*args, **kwargs))
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+
+    def _read_object(self, bucket_name: str, object_name: str) -> bytes:
+        response = self._client.get_object(bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _download_to_file(self, bucket_name: str, object_name: str, file: BinaryIO):
+        response = self._client.get_object(bucket_name, object_name)
+        try:
+            shutil.copyfileobj(response, file, PART_SIZE)
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def put_object(self, bucket_name: str, object_name: str, data: bytes, content_type: str):
+        await self._run(self._client.put_object, bucket_name, object_name, io.BytesIO(data), length=len(data),
+                        part_size=PART_SIZE, content_type=content_type)
+
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        return await self._run(self._read_object, bucket_name, object_name)
+
+    async def stat_object(self, bucket_name: str, object_name: str) -> str:
+        return (await self._run(self._client.stat_object, bucket_name, object_name)).etag
+
+    async def download_to_file(self, bucket_name: str, object_name: str, file: BinaryIO):
+        await self._run(self._download_to_file, bucket_name, object_name, file)
+
+    async def upload_from_file(self, bucket_name: str, object_name: str, file: BinaryIO, content_type: str):
+        await self._run(self._client.put_object, bucket_name, object_name, file, length=-1, part_size=PART_SIZE,
+                        content_type=content_type)
+
+    async def upload_stream(self, bucket_name: str, object_name: str, chunks: AsyncIterable[bytes],
+                            content_type: str):
+        read_fd, write_fd = os.pipe()
+        reader = _PipeReader(read_fd)
+        upload = asyncio.ensure_future(self._run(self._client.put_object, bucket_name, object_name, reader,
+                                                 length=-1, part_size=PART_SIZE, content_type=content_type))
+        # Once Minio stops reading, writes fail with BrokenPipeError instead of blocking on a full pipe
+        upload.add_done_callback(lambda _: reader.close())
+        loop = asyncio.get_running_loop()
+        try:
+            async for chunk in chunks:
+                await loop.run_in_executor(None, _write_all, write_fd, chunk)
+        except BrokenPipeError:
+            pass
+        except BaseException:
+            reader.failed = True
+            raise
+        finally:
+            os.close(write_fd)
+            if reader.failed:
+                await asyncio.gather(upload, return_exceptions=True)
+        await upload
+
+    async def copy_object(self, bucket_name: str, object_name: str, source_object_name: str):
+        await self._run(self._client.copy_object, bucket_name, object_name,
+                        CopySource(bucket_name, source_object_name))
+
+    async def remove_object(self, bucket_name: str, object_name: str):
+        await self._run(self._client.remove_object, bucket_name, object_name)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class HttpxS3Backend(StorageBackend):
+    """
+    Native asyncio backend; concurrency is only bounded by the httpx connection pool.
+    """
+
+    def __init__(self, client: AsyncS3Client):
+        self._client = client
+
+    async def put_object(self, bucket_name: str, object_name: str, data: bytes, content_type: str):
+        try:
+            await self._client.put_object(bucket_name, object_name, data, content_type=content_type)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        try:
+            return await self._client.get_object(bucket_name, object_name)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def stat_object(self, bucket_name: str, object_name: str) -> str:
+        try:
+            return await self._client.stat_object(bucket_name, object_name)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def download_to_file(self, bucket_name: str, object_name: str, file: BinaryIO):
+        try:
+            async with self._client.stream_object(bucket_name, object_name) as response:
+                async for chunk in response.aiter_bytes():
+                    file.write(chunk)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def upload_from_file(self, bucket_name: str, object_name: str, file: BinaryIO, content_type: str):
+        loop = asyncio.get_running_loop()
+        part = await loop.run_in_executor(None, file.read, PART_SIZE)
+        try:
+            if len(part) < PART_SIZE:
+                await self._client.put_object(bucket_name, object_name, part, content_type=content_type)
+                return
+
+            upload_id = await self._client.create_multipart_upload(bucket_name, object_name, content_type)
+            try:
+                etags = []
+                while part:
+                    etags.append(await self._client.upload_part(bucket_name, object_name, upload_id,
+                                                                len(etags) + 1, part))
+                    part = await loop.run_in_executor(None, file.read, PART_SIZE)
+                await self._client.complete_multipart_upload(bucket_name, object_name, upload_id, etags)
+            except BaseException:
+                await self._client.abort_multipart_upload(bucket_name, object_name, upload_id)
+                raise
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def upload_stream(self, bucket_name: str, object_name: str, chunks: AsyncIterable[bytes],
+                            content_type: str):
+        buffer = bytearray()
+        upload_id = None
+        etags = []
+        try:
+            try:
+                async for chunk in chunks:
+                    buffer += chunk
+                    while len(buffer) >= PART_SIZE:
+                        if upload_id is None:
+                            upload_id = await self._client.create_multipart_upload(bucket_name, object_name,
+                                                                                   content_type)
+                        etags.append(await self._client.upload_part(bucket_name, object_name, upload_id,
+                                                                    len(etags) + 1, bytes(buffer[:PART_SIZE])))
+                        del buffer[:PART_SIZE]
+                if upload_id is None:
+                    await self._client.put_object(bucket_name, object_name, bytes(buffer), content_type=content_type)
+                    return
+                if buffer:
+                    etags.append(await self._client.upload_part(bucket_name, object_name, upload_id,
+                                                                len(etags) + 1, bytes(buffer)))
+                await self._client.complete_multipart_upload(bucket_name, object_name, upload_id, etags)
+            except BaseException:
+                if upload_id is not None:
+                    await self._client.abort_multipart_upload(bucket_name, object_name, upload_id)
+                raise
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def copy_object(self, bucket_name: str, object_name: str, source_object_name: str):
+        try:
+            await self._client.copy_object(bucket_name, object_name, source_object_name)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def remove_object(self, bucket_name: str, object_name: str):
+        try:
+            await self._client.remove_object(bucket_name, object_name)
+        except S3ResponseError as e:
+            raise StorageError(str(e)) from e
+
+    async def close(self):
+        await self._client.aclose()
@@ -0,0 +1,59 @@
+from io import BytesIO
+from typing import Dict
+
+import pymupdf
+from PIL import Image
+
+from app.models.programs_upload import PROGRAM_KIND_THUMBNAIL_PREFIX
+from app.service.pdf import open_normalized_image
+from app.settings import settings
+
+# Pillow format and content type of each supported THUMBNAIL_FORMAT
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'avif': ('AVIF', 'image/avif'),
+}
+
+
+def thumbnail_kind(size: int) -> str:
+    return f'{PROGRAM_KIND_THUMBNAIL_PREFIX}{size}'
+
+
+def thumbnail_content_type() -> str:
+    return THUMBNAIL_FORMATS[settings.THUMBNAIL_FORMAT][1]
+
+
+def closest_thumbnail_size(size: int) -> int:
+    """
+    Smallest configured thumbnail that still covers ``size`` pixels, or the largest one.
+    """
+    sizes = sorted(settings.THUMBNAIL_SIZES)
+    return next((thumbnail_size for thumbnail_size in sizes if thumbnail_size >= size), sizes[-1])
+
+
+def render_thumbnails(source_bytes: bytes, source_is_pdf: bool) -> Dict[int, bytes]:
+    """
+    Every THUMBNAIL_SIZES thumbnail (longest side, in pixels) of an image or of the first page of a PDF.
+
+    The source is decoded or rasterized once, at the largest size, and each smaller size is reduced from the
+    previous one.
+    """
+    sizes = sorted(settings.THUMBNAIL_SIZES, reverse=True)
+    if source_is_pdf:
+        page = pymupdf.open(stream=source_bytes)[0]
+        scale = sizes[0] / max(page.rect.width, page.rect.height)
+        pix = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale))
+        img = Image.frombytes('RGBA' if pix.alpha else 'RGB', (pix.width, pix.height), pix.samples)
+    else:
+        img, _ = open_normalized_image(source_bytes, (sizes[0], sizes[0]))
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+
+    image_format, _ = THUMBNAIL_FORMATS[settings.THUMBNAIL_FORMAT]
+    thumbnails = {}
+    for size in sizes:
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = BytesIO()
+        img.save(output, format=image_format, quality=settings.THUMBNAIL_QUALITY)
+        thumbnails[size] = output.getvalue()
+    return thumbnails
@@ -1,5 +1,6 @@
 import os
 from functools import lru_cache
+from typing import List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,9 +15,40 @@ class Settings(BaseSettings):
     REPORT_JAR_PATH: str
     REPORT_JAR_NAME: str
     REPORT_BASE_PATH: str
+    REPORT_JVM_OPTIONS: str = ''
+    REPORT_CDS_ENABLED: bool = True
+    REPORT_RENDER_TIMEOUT: int = 60
+    REPORT_WORKERS: int = 0
+    REPORT_QUEUE_LIMIT: int = 100
+    REPORT_CACHE_TTL_HOURS: int = 20
+    REPORT_IN_FLIGHT_TTL: int = 600
     MINIO_HOST: str
     MINIO_ACCESS_KEY: str
     MINIO_SECRET_KEY: str
+    MINIO_REGION: str = 'us-east-1'
+    MINIO_MAX_WORKERS: int = 16
+    STORAGE_BACKEND: str = 'minio'
+    STORAGE_MAX_CONNECTIONS: int = 200
+    STORAGE_FETCH_CONCURRENCY: int = 8
+    PDF_MERGE_MEMORY_BUDGET: int = 32 * 1024 * 1024
+    PDF_MERGE_INCREMENTAL: bool = True
+    COMPUTE_MAX_WORKERS: int = 0
+    COMPUTE_MAX_TASKS_PER_CHILD: int = 200
+    IMAGE_MAX_DPI: int = 200
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_COVER_FORMAT: str = 'webp'
+    IMAGE_COVER_QUALITY: int = 80
+    IMAGE_COVER_MAX_SIZE: int = 842
+    THUMBNAIL_SIZES: List[int] = [160, 480]
+    THUMBNAIL_FORMAT: str = 'webp'
+    THUMBNAIL_QUALITY: int = 75
+    OFFICE_BINARY: str = 'soffice'
+    OFFICE_POOL_SIZE: int = 2
+    OFFICE_PROFILE_DIR: str = '/tmp/office-pool'
+    OFFICE_START_TIMEOUT: int = 30
+    OFFICE_CONVERSION_TIMEOUT: int = 15
+    PROGRAMS_CACHE_MAX_ENTRIES: int = 5
+    PROGRAMS_CACHE_TTL_HOURS: int = 7 * 24
     SECRET_KEY: str = ''
     ALGORITHM: str = 'HS256'
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 3600
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from taskiq import TaskiqDepends, Context
+from taskiq.depends.progress_tracker import TaskProgress, TaskState
+
+from app.database import get_session_contextmanager
+from app.models import ProgramsUpload
+from app.models.programs_upload import PROGRAM_KIND_PDF, PROGRAM_KIND_COVER, PROGRAM_KIND_THUMBNAIL_PREFIX, \
+    PROGRAM_STATUS_READY, PROGRAM_STATUS_FAILED
+from app.schema.programs_upload import ProgramsUploadSchema
+from app.service.compute import run_in_process
+from app.service.minio import BUCKET_PROGRAMS_NAME, download_files_from_minio, upload_fileobj_to_minio, \
+    get_file_url_from_minio, get_file_bytes_from_minio, upload_file_to_minio, delete_file_from_minio
+from app.service.pdf import merge_pdf_ranges, convert_image_to_pdf, convert_doc_to_pdf, extract_cover_from_pdf, \
+    convert_image_to_cover, cover_content_type
+from app.service.programs_cache import find_cached_pdf, evict_cached_pdfs, find_latest_cached_pdf, \
+    load_manifest, save_manifest, build_manifest
+from app.service.thumbnail import render_thumbnails, thumbnail_kind, thumbnail_content_type
+from app.settings import get_settings, Settings
+from app.worker import broker
+
+logger = logging.getLogger(__name__)
+
+SOURCE_KIND_IMAGE = 'image'
+SOURCE_KIND_PDF = 'pdf'
+SOURCE_KIND_DOC = 'doc'
+
+
+def program_source_location(id_psychologist: int, asset_uuid: str) -> Tuple[str, str]:
+    """
+    (name, path) of the raw upload an asset is converted from.
+    """
+    return asset_uuid, f'{id_psychologist}/{asset_uuid}/source'
+
+
+@broker.task
+async def convert_program_upload(id_psychologist: int, asset_uuid: str, source_kind: str,
+                                 extension: Optional[str] = None, ctx: Context = TaskiqDepends()):
+    """
+    Build the PDF, cover and thumbnails of a pending asset from its raw upload, then mark the asset ready (or
+    failed).
+    ``extension`` is only needed to convert documents.
+    """
+    await broker.result_backend.set_progress(
+        ctx.message.task_id,
+        TaskProgress(state=TaskState.STARTED, meta=None)
+    )
+    source_name, source_path = program_source_location(id_psychologist, asset_uuid)
+    # Sessions only wrap the queries: conversions take long and must not hold a pooled connection meanwhile
+    async with get_session_contextmanager() as session:
+        db_programs = (await session.scalars(
+            select(ProgramsUpload).where(ProgramsUpload.asset_uuid == asset_uuid)
+        )).all()
+    db_program_pdf = next((p for p in db_programs if p.kind == PROGRAM_KIND_PDF), None)
+    db_program_cover = next((p for p in db_programs if p.kind == PROGRAM_KIND_COVER), None)
+    db_thumbnails = {p.kind: p for p in db_programs if p.kind.startswith(PROGRAM_KIND_THUMBNAIL_PREFIX)}
+    if not db_program_pdf or not db_program_cover:
+        # Deleted while queued
+        await delete_file_from_minio(source_name, source_path, BUCKET_PROGRAMS_NAME)
+        await broker.result_backend.set_progress(
+            ctx.message.task_id,
+            TaskProgress(state=TaskState.SUCCESS, meta=None)
+        )
+        return {'asset_uuid': asset_uuid, 'status': None}
+
+    status = PROGRAM_STATUS_FAILED
+    try:
+        source_bytes = await get_file_bytes_from_minio(source_name, source_path, BUCKET_PROGRAMS_NAME)
+        if source_kind == SOURCE_KIND_IMAGE:
+            pdf_bytes, cover_bytes, thumbnails = await asyncio.gather(
+                run_in_process(convert_image_to_pdf, source_bytes),
+                run_in_process(convert_image_to_cover, source_bytes),
+                run_in_process(render_thumbnails, source_bytes, False),
+            )
+        else:
+            if source_kind == SOURCE_KIND_DOC:
+                pdf_bytes = await convert_doc_to_pdf(source_bytes, extension)
+            else:
+                pdf_bytes = source_bytes
+            cover_bytes, thumbnails = await asyncio.gather(
+                run_in_process(extract_cover_from_pdf, pdf_bytes),
+                run_in_process(render_thumbnails, pdf_bytes, True),
+            )
+        await upload_file_to_minio(pdf_bytes, 'application/pdf', db_program_pdf.name, db_program_pdf.path,
+                                   BUCKET_PROGRAMS_NAME)
+        await upload_file_to_minio(cover_bytes, cover_content_type(), db_program_cover.name,
+                                   db_program_cover.path, BUCKET_PROGRAMS_NAME)
+        for size, thumbnail_bytes in thumbnails.items():
+            db_thumbnail = db_thumbnails.get(thumbnail_kind(size))
+            if db_thumbnail:
+                await upload_file_to_minio(thumbnail_bytes, thumbnail_content_type(), db_thumbnail.name,
+                                           db_thumbnail.path, BUCKET_PROGRAMS_NAME)
+        status = PROGRAM_STATUS_READY
+    except Exception:
+        logger.exception('Could not convert program %s', asset_uuid)
+        raise
+    finally:
+        async with get_session_contextmanager() as session:
+            result = await session.execute(
+                update(ProgramsUpload).where(ProgramsUpload.asset_uuid == asset_uuid).values(status=status)
+            )
+            await session.commit()
+
+    if not result.rowcount:
+        # Deleted while converting; drop what was just uploaded
+        for program in db_programs:
+            await delete_file_from_minio(program.name, program.path, BUCKET_PROGRAMS_NAME)
+    await delete_file_from_minio(source_name, source_path, BUCKET_PROGRAMS_NAME)
+    await broker.result_backend.set_progress(
+        ctx.message.task_id,
+        TaskProgress(state=TaskState.SUCCESS, meta=None)
+    )
+    return {'asset_uuid': asset_uuid, 'status': status}
+
+
+@broker.task
+async def generate_unified_pdf(id_psychologist: int, cache_key: str, programs: List[Tuple[str, str, str]],
+                               settings: Settings = TaskiqDepends(get_settings), ctx: Context = TaskiqDepends()):
+    """
+    Merge the (name, path, etag) PDFs in ``programs`` and store the result under ``cache_key``.
+
+    Sources already present in the most recently used merge are spliced from it by page range, so only new or
+    changed PDFs are downloaded.
+    """
+    total = 0
+    fetched = 0
+
+    async def set_progress(stage: str):
+        await broker.result_backend.set_progress(
+            ctx.message.task_id,
+            TaskProgress(state=TaskState.STARTED, meta={'stage': stage, 'done': fetched, 'total': total})
+        )
+
+    async def on_fetched(_):
+        nonlocal fetched
+        fetched += 1
+        await set_progress('downloading')
+
+    # Sessions only wrap the queries, so no pooled connection idles through the download, merge and upload
+    async with get_session_contextmanager() as session:
+        # An identical request may have been merged while this one was queued
+        db_program_generated = await find_cached_pdf(session, id_psychologist, cache_key)
+        db_program_base = None if db_program_generated else await find_latest_cached_pdf(session, id_psychologist)
+        await session.commit()
+        if db_program_generated:
+            program_generated_schema = ProgramsUploadSchema.model_validate(db_program_generated)
+
+    if not db_program_generated:
+        reusable = {}
+        if settings.PDF_MERGE_INCREMENTAL and db_program_base:
+            manifest = await load_manifest(db_program_base)
+            reusable = {entry['etag']: entry for entry in manifest or []}
+        downloads = [(name, path) for name, path, etag in programs if etag not in reusable]
+        reuse_base = len(downloads) < len(programs)
+        if reuse_base:
+            downloads.insert(0, (db_program_base.name, db_program_base.path))
+        total = len(downloads)
+        await set_progress('downloading')
+
+        db_program_generated = ProgramsUpload(
+            filename='report',
+            sequence=-1,
+            name=f'{cache_key}.pdf',
+            generated=True,
+            id_psychologist=id_psychologist,
+            path=f'{id_psychologist}/{cache_key}/pdf',
+            asset_uuid=cache_key,
+            kind=PROGRAM_KIND_PDF,
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pdf_paths = await download_files_from_minio(downloads, tmpdir, BUCKET_PROGRAMS_NAME,
+                                                        on_fetched=on_fetched)
+            base_path = pdf_paths.pop(0) if reuse_base else None
+            source_paths = iter(pdf_paths)
+            parts = []
+            for _, _, etag in programs:
+                entry = reusable.get(etag)
+                if entry:
+                    parts.append((base_path, (entry['start'], entry['start'] + entry['count'])))
+                else:
+                    parts.append((next(source_paths), None))
+            logger.info('Merging %d PDFs for psychologist %d, %d spliced from %s', len(programs),
+                        id_psychologist, len(programs) - len(pdf_paths),
+                        db_program_base.name if reuse_base else None)
+
+            await set_progress('merging')
+            final_pdf_path = Path(tmpdir, db_program_generated.name)
+            page_counts = await run_in_process(merge_pdf_ranges, parts, final_pdf_path)
+            await set_progress('uploading')
+            with final_pdf_path.open('rb') as final_pdf:
+                await upload_fileobj_to_minio(final_pdf, 'application/pdf', db_program_generated.name,
+                                              db_program_generated.path, BUCKET_PROGRAMS_NAME)
+        await save_manifest(db_program_generated, build_manifest(programs, page_counts))
+
+        async with get_session_contextmanager() as session:
+            session.add(db_program_generated)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # A concurrent task stored the same key (and the same bytes) first, and evicts for it
+                await session.rollback()
+                db_program_generated = await find_cached_pdf(session, id_psychologist, cache_key)
+                await session.commit()
+            else:
+                await evict_cached_pdfs(session, id_psychologist, keep=cache_key)
+            program_generated_schema = ProgramsUploadSchema.model_validate(db_program_generated)
+
+    program_generated_schema.pdf = get_file_url_from_minio(db_program_generated.name, db_program_generated.path,
+                                                           BUCKET_PROGRAMS_NAME)
+    await broker.result_backend.set_progress(
+        ctx.message.task_id,
+        TaskProgress(state=TaskState.SUCCESS, meta={'stage': 'done', 'done': total, 'total': total})
+    )
+    return program_generated_schema.model_dump(mode='json')
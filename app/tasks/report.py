@@ -1,20 +1,21 @@
 import os
-from asyncio import create_subprocess_exec, subprocess, wait_for, Semaphore
 from pathlib import Path
+from typing import AsyncIterator, Optional
 from uuid import uuid4
 
 from taskiq import TaskiqDepends, Context
 from taskiq.depends.progress_tracker import TaskProgress, TaskState
 
-from app.service.minio import BUCKET_IDADI_NAME, upload_file_to_minio, get_file_url_from_minio
+from app.service.minio import BUCKET_IDADI_NAME, upload_stream_to_minio, get_file_url_from_minio
+from app.service.report_cache import store_cached_report, release_report_render
+from app.service.report_executor import REPORT_EXECUTOR
 from app.settings import get_settings, Settings
 from app.worker import broker
 
-JAR_SEMAPHORE = Semaphore(1)
-
 
 @broker.task
 async def generate_jasper_report(jasper_file_name: str, parameters: dict, mode: str = 'PDF',
+                                 cache_key: Optional[str] = None,
                                  settings: Settings = TaskiqDepends(get_settings), ctx: Context = TaskiqDepends()):
     await broker.result_backend.set_progress(
         ctx.message.task_id,
@@ -29,22 +30,30 @@ async def generate_jasper_report(jasper_file_name: str, parameters: dict, mode:
     uuid_out_name = str(uuid4())
     parameters_str = ':'.join(f'{k}={v}' for k, v in parameters.items()) if parameters else ''
 
-    args = ['java', '-jar', jar_name, '--base-dir', report_base_dir, '--parameters', parameters_str, '--mode', mode,
-            '--generate-from-file', jasper_file_name, '--db-username', db_username, '--db-password', db_password,
-            '--db-host', db_host, '--db-database', db_name, '--pdf-output-name', uuid_out_name]
+    jvm_options = settings.REPORT_JVM_OPTIONS.split()
+    if settings.REPORT_CDS_ENABLED:
+        # The first run dumps an AppCDS archive next to the jar; later JVMs map the already parsed classes from it
+        archive = os.path.join(settings.REPORT_JAR_PATH, f'{os.path.splitext(settings.REPORT_JAR_NAME)[0]}.jsa')
+        jvm_options = [f'-XX:SharedArchiveFile={archive}', '-XX:+AutoCreateSharedArchive', *jvm_options]
+
+    args = ['java', *jvm_options, '-jar', jar_name, '--base-dir', report_base_dir, '--parameters', parameters_str,
+            '--mode', mode, '--generate-from-file', jasper_file_name, '--db-username', db_username,
+            '--db-password', db_password, '--db-host', db_host, '--db-database', db_name,
+            '--pdf-output-name', uuid_out_name]
+    compile_only = mode.lower() == 'compile'
+
+    async def upload(chunks: AsyncIterator[bytes]):
+        await upload_stream_to_minio(chunks, 'application/pdf', uuid_out_name, 'pdf', BUCKET_IDADI_NAME)
+
     try:
-        async with JAR_SEMAPHORE:
-            proc = await create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = await wait_for(proc.communicate(), timeout=60)
-            print(stdout)
-            print(stderr)
-        if mode.lower() == 'compile':
+        # The JVM writes the PDF into a FIFO that is uploaded as it is read, so it never lands on disk
+        output = None if compile_only else Path(report_base_dir, 'pdf', f'{uuid_out_name}.pdf')
+        stdout = await REPORT_EXECUTOR.run_process(args, output=output, consume=upload)
+        print(stdout)
+        if compile_only:
             return
-        pdf_path = os.path.join(f'{report_base_dir}/pdf/', f'{uuid_out_name}.pdf')
-        pdf_path = Path(pdf_path)
-        pdf_bytes = pdf_path.read_bytes()
-        pdf_path.unlink()
-        upload_file_to_minio(pdf_bytes, 'application/pdf', uuid_out_name, 'pdf', BUCKET_IDADI_NAME)
+        if cache_key:
+            await store_cached_report(cache_key, uuid_out_name)
         pdf_minio_url = get_file_url_from_minio(uuid_out_name, 'pdf', BUCKET_IDADI_NAME)
         await broker.result_backend.set_progress(
             ctx.message.task_id,
@@ -58,3 +67,6 @@ async def generate_jasper_report(jasper_file_name: str, parameters: dict, mode:
         print(f"mode: {mode}")
         print(f"Parameters STR: {parameters_str}")
         raise e
+    finally:
+        if cache_key:
+            await release_report_render(cache_key, ctx.message.task_id)
@@ -1,8 +1,27 @@
+from taskiq import TaskiqEvents, TaskiqState
 from taskiq_redis import RedisStreamBroker, RedisAsyncResultBackend
 
+from app.service.compute import shutdown_compute_executor
+from app.service.minio import STORAGE_BACKEND
+from app.service.office import OFFICE_POOL
+from app.service.report_executor import REPORT_EXECUTOR
 from app.settings import settings
 
 redis_url = settings.BROKER_URL
 broker = RedisStreamBroker(
     url=redis_url
-).with_result_backend(RedisAsyncResultBackend(redis_url, result_ex_time=1000, keep_results=False))
+).with_result_backend(RedisAsyncResultBackend(redis_url, result_ex_time=1000, keep_results=True))
+
+
+@broker.on_event(TaskiqEvents.WORKER_STARTUP)
+async def start_office_pool(_: TaskiqState):
+    # Start LibreOffice up front so the first document conversion does not pay for it
+    await OFFICE_POOL.start()
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def stop_worker_pools(_: TaskiqState):
+    await OFFICE_POOL.stop()
+    shutdown_compute_executor()
+    await REPORT_EXECUTOR.stop()
+    await STORAGE_BACKEND.close()
@@ -0,0 +1,90 @@
+"""
+Compares CPU time and peak allocations of the previous and current ``convert_image_to_pdf``.
+
+Point it at a directory of phone-camera photos (JPEG/PNG); without one it generates a synthetic corpus of
+12 MP JPEGs and alpha PNGs:
+
+    python -m benchmarks.convert_image_to_pdf [photos_dir] [rounds]
+"""
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, List
+
+import img2pdf
+from PIL import Image
+from pypdf import PdfWriter
+
+from app.service.pdf import convert_image_to_pdf
+
+
+def previous_convert_image_to_pdf(img_byte: bytes):
+    img = Image.open(BytesIO(img_byte))
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    else:
+        img = img.convert("RGB")
+    writer = PdfWriter()
+    output = BytesIO()
+    img.save(output, format="JPEG")
+    img_byte = output.getvalue()
+    with Image.open(BytesIO(img_byte)) as img:
+        width, height = img.size
+        if width > height:
+            layout_fun = img2pdf.get_layout_fun((img2pdf.mm_to_pt(297), img2pdf.mm_to_pt(210)))
+        else:
+            layout_fun = img2pdf.get_layout_fun((img2pdf.mm_to_pt(210), img2pdf.mm_to_pt(297)))
+        writer.append(BytesIO(img2pdf.convert(img_byte, layout_fun=layout_fun)))
+        output_buffer = BytesIO()
+        writer.write(output_buffer)
+        return output_buffer.getvalue()
+
+
+def synthetic_corpus() -> List[bytes]:
+    corpus = []
+    for index in range(6):
+        # noise keeps the JPEGs close to camera sizes (several MB at 12 MP)
+        img = Image.effect_noise((3000, 4000) if index % 2 else (4000, 3000), 60).convert('RGB')
+        output = BytesIO()
+        img.save(output, format='JPEG', quality=92)
+        corpus.append(output.getvalue())
+    screenshot = Image.effect_noise((1170, 2532), 30).convert('RGBA')
+    output = BytesIO()
+    screenshot.save(output, format='PNG')
+    corpus.append(output.getvalue())
+    return corpus
+
+
+def measure(name: str, convert: Callable[[bytes], bytes], corpus: List[bytes], rounds: int):
+    started = time.process_time()
+    for _ in range(rounds):
+        for img_byte in corpus:
+            convert(img_byte)
+    cpu = time.process_time() - started
+
+    tracemalloc.start()
+    for img_byte in corpus:
+        convert(img_byte)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:>8}: {cpu / (rounds * len(corpus)) * 1000:.1f} ms CPU per image, '
+          f'{peak / 1024 / 1024:.1f} MiB peak traced allocations')
+
+
+def main(photos_dir: str, rounds: int):
+    if photos_dir:
+        corpus = [path.read_bytes() for path in sorted(Path(photos_dir).iterdir())
+                  if path.suffix.lower() in ('.jpg', '.jpeg', '.png')]
+    else:
+        corpus = synthetic_corpus()
+    print(f'{len(corpus)} images, {sum(map(len, corpus)) / 1024 / 1024:.1f} MiB')
+    measure('previous', previous_convert_image_to_pdf, corpus, rounds)
+    measure('current', convert_image_to_pdf, corpus, rounds)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else '', int(sys.argv[2]) if len(sys.argv) > 2 else 3)
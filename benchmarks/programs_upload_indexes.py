@@ -0,0 +1,81 @@
+"""
+Compares the query plans of the hot programs_upload queries with and without the indexes from migrations
+4b7e21c9d3a5 and 9c3f5a2e7b18, on a temporary copy of the table seeded with 1M rows.
+
+Run against a disposable database configured in the usual ``.env`` file:
+
+    python -m benchmarks.programs_upload_indexes [rows]
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+from app.database import engine
+
+SEED = '''
+    INSERT INTO bench_programs_upload (id, name, filename, path, asset_uuid, kind, generated, sequence,
+                                       id_psychologist, created_at, updated_at)
+    SELECT i,
+           md5((i / 2)::text) || (CASE WHEN i % 2 = 0 THEN '.pdf' ELSE '.png' END),
+           'document_' || i,
+           (i % 1000) || '/' || md5((i / 2)::text) || (CASE WHEN i % 2 = 0 THEN '/pdf' ELSE '/cover' END),
+           md5((i / 2)::text),
+           CASE WHEN i % 2 = 0 THEN 'pdf' ELSE 'cover' END,
+           i % 500 = 0,
+           i / 2000,
+           i % 1000,
+           now(),
+           now()
+    FROM generate_series(1, :rows) AS i
+'''
+
+INDEXES = [
+    'CREATE INDEX ON bench_programs_upload (id_psychologist, generated, sequence)',
+    'CREATE UNIQUE INDEX ON bench_programs_upload (asset_uuid, kind)',
+]
+
+QUERIES = {
+    'list programs of a psychologist': '''
+        SELECT * FROM bench_programs_upload
+        WHERE id_psychologist = 42 AND generated = false ORDER BY sequence
+    ''',
+    'generated report of a psychologist': '''
+        SELECT * FROM bench_programs_upload WHERE id_psychologist = 42 AND generated = true
+    ''',
+    'max sequence of a psychologist': '''
+        SELECT max(sequence) FROM bench_programs_upload WHERE id_psychologist = 42
+    ''',
+    'files of an asset': '''
+        SELECT * FROM bench_programs_upload WHERE asset_uuid = md5('4242')
+    ''',
+}
+
+
+async def explain_all(connection, title):
+    print(f'===== {title} =====')
+    for name, query in QUERIES.items():
+        plan = (await connection.execute(text(f'EXPLAIN (ANALYZE, COSTS OFF, TIMING ON) {query}'))).scalars().all()
+        print(f'--- {name}')
+        print('\n'.join(plan))
+
+
+async def main(rows: int):
+    async with engine.connect() as connection:
+        await connection.execute(text(
+            'CREATE TEMP TABLE bench_programs_upload (LIKE programs_upload INCLUDING DEFAULTS)'
+        ))
+        await connection.execute(text(SEED), {'rows': rows})
+        await connection.execute(text('ANALYZE bench_programs_upload'))
+        await explain_all(connection, f'{rows} rows, no indexes')
+
+        for index in INDEXES:
+            await connection.execute(text(index))
+        await connection.execute(text('ANALYZE bench_programs_upload'))
+        await explain_all(connection, f'{rows} rows, with indexes')
+        await connection.rollback()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,49 @@
+"""
+Runs concurrent put/get/copy/delete rounds against the configured MinIO with both storage backends.
+
+Point ``MINIO_HOST`` at a local MinIO (``docker compose up minio``) and run:
+
+    python -m benchmarks.storage_backends [concurrency] [object_kb]
+"""
+import asyncio
+import os
+import sys
+import time
+from uuid import uuid4
+
+from app.service.minio import MINIO_CLIENT, BUCKET_PROGRAMS_NAME
+from app.service.s3 import AsyncS3Client
+from app.service.storage import StorageBackend, MinioThreadBackend, HttpxS3Backend
+from app.settings import settings
+
+
+async def round_trip(backend: StorageBackend, prefix: str, index: int, payload: bytes):
+    name = f'{prefix}/{index}'
+    await backend.put_object(BUCKET_PROGRAMS_NAME, name, payload, 'application/octet-stream')
+    assert await backend.get_object(BUCKET_PROGRAMS_NAME, name) == payload
+    await backend.copy_object(BUCKET_PROGRAMS_NAME, f'{name}.copy', name)
+    await backend.remove_object(BUCKET_PROGRAMS_NAME, f'{name}.copy')
+    await backend.remove_object(BUCKET_PROGRAMS_NAME, name)
+
+
+async def run(name: str, backend: StorageBackend, concurrency: int, payload: bytes):
+    prefix = f'benchmark/{uuid4()}'
+    started = time.perf_counter()
+    await asyncio.gather(*(round_trip(backend, prefix, i, payload) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f'{name:>8}: {concurrency} round trips in {elapsed:.2f}s ({concurrency * 5 / elapsed:.0f} ops/s)')
+    await backend.close()
+
+
+async def main(concurrency: int, object_kb: int):
+    payload = os.urandom(object_kb * 1024)
+    await run('minio', MinioThreadBackend(MINIO_CLIENT, settings.MINIO_MAX_WORKERS), concurrency, payload)
+    await run('httpx', HttpxS3Backend(AsyncS3Client(
+        settings.MINIO_HOST, settings.MINIO_ACCESS_KEY, settings.MINIO_SECRET_KEY, region=settings.MINIO_REGION,
+        max_connections=settings.STORAGE_MAX_CONNECTIONS,
+    )), concurrency, payload)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 256))
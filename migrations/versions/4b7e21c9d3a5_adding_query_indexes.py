@@ -0,0 +1,54 @@
+"""adding query indexes
+
+Revision ID: 4b7e21c9d3a5
+Revises: 36721c734dc6
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e21c9d3a5'
+down_revision: Union[str, Sequence[str], None] = '36721c734dc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_programs_upload_psychologist_generated_sequence', 'programs_upload',
+                    ['id_psychologist', 'generated', 'sequence'], unique=False)
+    op.create_index('ix_programs_upload_name_pattern', 'programs_upload', ['name'], unique=False,
+                    postgresql_ops={'name': 'text_pattern_ops'})
+    op.create_index('ix_patients_psychologist_name', 'patients', ['id_psychologist', 'name'], unique=False)
+    op.create_index('ix_idadi_normative_tables_lookup', 'idadi_normative_tables',
+                    ['id_domain', 'raw_score', 'initial_age_range', 'final_age_range'], unique=False,
+                    postgresql_include=['standardized'])
+    op.create_index('ix_idadi_id_patient', 'idadi', ['id_patient'], unique=False)
+    op.create_index('ix_idadi_values_id_idadi', 'idadi_values', ['id_idadi'], unique=False)
+    op.create_index('ix_patient_records_id_patient', 'patient_records', ['id_patient'], unique=False)
+    op.create_index('ix_pti_id_patient', 'pti', ['id_patient'], unique=False)
+    op.create_index('ix_pti_stimulus_areas_id_pti', 'pti_stimulus_areas', ['id_pti'], unique=False)
+    op.create_index('ix_pti_specific_objectives_topics_id_area', 'pti_specific_objectives_topics',
+                    ['id_pti_stimulus_area'], unique=False)
+    op.create_index('ix_pti_specific_objectives_subtopics_id_topic', 'pti_specific_objectives_subtopics',
+                    ['id_pti_specific_objectives_topics'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pti_specific_objectives_subtopics_id_topic', table_name='pti_specific_objectives_subtopics')
+    op.drop_index('ix_pti_specific_objectives_topics_id_area', table_name='pti_specific_objectives_topics')
+    op.drop_index('ix_pti_stimulus_areas_id_pti', table_name='pti_stimulus_areas')
+    op.drop_index('ix_pti_id_patient', table_name='pti')
+    op.drop_index('ix_patient_records_id_patient', table_name='patient_records')
+    op.drop_index('ix_idadi_values_id_idadi', table_name='idadi_values')
+    op.drop_index('ix_idadi_id_patient', table_name='idadi')
+    op.drop_index('ix_idadi_normative_tables_lookup', table_name='idadi_normative_tables')
+    op.drop_index('ix_patients_psychologist_name', table_name='patients')
+    op.drop_index('ix_programs_upload_name_pattern', table_name='programs_upload')
+    op.drop_index('ix_programs_upload_psychologist_generated_sequence', table_name='programs_upload')
@@ -0,0 +1,29 @@
+"""adding programs upload status
+
+Revision ID: 7a2c4e9d1f30
+Revises: e5d1a0b6c2f4
+Create Date: 2026-10-18 15:42:08.311274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2c4e9d1f30'
+down_revision: Union[str, Sequence[str], None] = 'e5d1a0b6c2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # every existing upload was converted inside its request
+    op.add_column('programs_upload', sa.Column('status', sa.String(), server_default='ready', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('programs_upload', 'status')
@@ -0,0 +1,41 @@
+"""adding programs upload asset key
+
+Revision ID: 9c3f5a2e7b18
+Revises: 4b7e21c9d3a5
+Create Date: 2026-10-18 11:03:27.904615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f5a2e7b18'
+down_revision: Union[str, Sequence[str], None] = '4b7e21c9d3a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('programs_upload', sa.Column('asset_uuid', sa.String(), nullable=True))
+    op.add_column('programs_upload', sa.Column('kind', sa.String(), nullable=True))
+    # names are '{uuid}.{ext}' and paths '{id_psychologist}/{uuid}/{kind}'
+    op.execute(
+        "UPDATE programs_upload SET asset_uuid = split_part(name, '.', 1), kind = split_part(path, '/', 3)"
+    )
+    op.alter_column('programs_upload', 'asset_uuid', existing_type=sa.String(), nullable=False)
+    op.alter_column('programs_upload', 'kind', existing_type=sa.String(), nullable=False)
+    op.create_index('ix_programs_upload_asset_uuid_kind', 'programs_upload', ['asset_uuid', 'kind'], unique=True)
+    op.drop_index('ix_programs_upload_name_pattern', table_name='programs_upload')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_programs_upload_name_pattern', 'programs_upload', ['name'], unique=False,
+                    postgresql_ops={'name': 'text_pattern_ops'})
+    op.drop_index('ix_programs_upload_asset_uuid_kind', table_name='programs_upload')
+    op.drop_column('programs_upload', 'kind')
+    op.drop_column('programs_upload', 'asset_uuid')
@@ -0,0 +1,40 @@
+"""spreading programs upload sequences
+
+Revision ID: e5d1a0b6c2f4
+Revises: 9c3f5a2e7b18
+Create Date: 2026-10-18 11:47:09.215730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5d1a0b6c2f4'
+down_revision: Union[str, Sequence[str], None] = '9c3f5a2e7b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEQUENCE_GAP = 1024
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"UPDATE programs_upload SET sequence = (sequence + 1) * {SEQUENCE_GAP} WHERE generated = false"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        UPDATE programs_upload p SET sequence = r.rank - 1
+        FROM (SELECT asset_uuid,
+                     dense_rank() OVER (PARTITION BY id_psychologist ORDER BY sequence, asset_uuid) AS rank
+              FROM programs_upload WHERE generated = false) r
+        WHERE p.asset_uuid = r.asset_uuid
+        """
+    )
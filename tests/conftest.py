@@ -0,0 +1,18 @@
+import os
+
+# Settings are read at import time; tests need no real services behind them
+for name, value in {
+    'DATABASE_TYPE': 'postgresql+asyncpg',
+    'DATABASE_HOST': 'localhost',
+    'DATABASE_NAME': 'test',
+    'DB_USER': 'test',
+    'DB_PASSWORD': 'test',
+    'BROKER_URL': 'redis://localhost:6379',
+    'REPORT_JAR_PATH': '/tmp',
+    'REPORT_JAR_NAME': 'report.jar',
+    'REPORT_BASE_PATH': '/tmp',
+    'MINIO_HOST': 'localhost:9000',
+    'MINIO_ACCESS_KEY': 'test',
+    'MINIO_SECRET_KEY': 'test',
+}.items():
+    os.environ.setdefault(name, value)
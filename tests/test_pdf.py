@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pymupdf
+
+from app.service.pdf import merge_pdf_ranges
+
+
+def _pdf_with_link(path: Path, pages: int, source: int, target: int):
+    doc = pymupdf.open()
+    for index in range(pages):
+        doc.new_page().insert_text((72, 72), f'page {index}')
+    doc[source].insert_link({'kind': pymupdf.LINK_GOTO, 'from': pymupdf.Rect(72, 100, 200, 120), 'page': target})
+    doc.save(path)
+
+
+def _link_targets(path: Path) -> list:
+    with pymupdf.open(path) as doc:
+        return [(page.number, link['page']) for page in doc for link in page.get_links()]
+
+
+def test_merge_keeps_forward_links(tmp_path):
+    source = tmp_path / 'source.pdf'
+    _pdf_with_link(source, pages=3, source=0, target=2)
+    output = tmp_path / 'merged.pdf'
+
+    assert merge_pdf_ranges([(source, None)], output) == [3]
+    assert _link_targets(output) == [(0, 2)]
+
+
+def test_merge_keeps_forward_links_across_parts(tmp_path):
+    first = tmp_path / 'first.pdf'
+    _pdf_with_link(first, pages=1, source=0, target=0)
+    second = tmp_path / 'second.pdf'
+    _pdf_with_link(second, pages=4, source=1, target=3)
+    output = tmp_path / 'merged.pdf'
+
+    assert merge_pdf_ranges([(first, None), (second, (0, 2)), (second, (2, 4))], output) == [1, 2, 2]
+    assert _link_targets(output) == [(0, 0), (2, 4)]